@@ -1,10 +1,13 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import os
-from datetime import datetime
-from core.engine import IndexEngine
+from datetime import datetime, timedelta
+from core.registry import load_registry
+from core.query import IndexQuery
+from core.series import chart_series, lttb
+from core.analytics import ROLLING_METRICS, rolling_series
+from core.config import CHART_MAX_POINTS
 
 # ==========================================
 # 1. 頁面基礎設定
@@ -44,10 +47,62 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-engine = IndexEngine()
+# ==========================================
+# 2. 輔助函式：唯讀查詢 (所有使用者共用，只讀寫入端發布的快照；快照更新時自動換新版本)
+# ==========================================
+@st.cache_resource(show_spinner=False)
+def get_query(index):
+    return IndexQuery(index)
+
+# 走勢圖可見區間 (日曆天數，None 為全部)
+CHART_RANGES = {"3個月": 92, "6個月": 183, "1年": 366, "3年": 1096, "全部": None}
+
+@st.cache_data(show_spinner=False)
+def chart_points(index, snapshot_mtime, range_days):
+    """ 依可見區間切出序列並挑選解析度，點數控制在 CHART_MAX_POINTS 左右 (snapshot_mtime 為快取鍵) """
+    view = get_query(index).view()
+    start = None
+    if range_days and view.dates:
+        last = datetime.strptime(view.dates[-1], "%Y-%m-%d")
+        start = (last - timedelta(days=range_days)).strftime("%Y-%m-%d")
+    rows = view.history(start)
+    bars = {period: [b for b in view.bars[period] if b[0] >= (start or "")] for period in ("weekly", "monthly")}
+    return chart_series([d for d, _ in rows], [v for _, v in rows], bars, CHART_MAX_POINTS)
+
+# 滾動分析：指標名稱與可選視窗 (交易日)
+ROLLING_LABELS = {"return": "報酬 (%)", "volatility": "年化波動 (%)", "sharpe": "Sharpe", "drawdown": "視窗內回撤 (%)"}
+ROLLING_WINDOWS = [20, 60, 120, 252]
+
+@st.cache_data(show_spinner=False)
+def rolling_points(index, snapshot_mtime, metric, window):
+    """ 滾動指標 (core.analytics 依快照版本記憶) 再降採樣成圖表點數 """
+    view = get_query(index).view()
+    values = rolling_series(metric, view.values, window, (index["id"], view.mtime))
+    first = window - 1 if metric == "drawdown" else window # 前面不足一個視窗的都是 NaN
+    dates, ys = view.dates[first:], values[first:].tolist()
+    keep = lttb(range(len(ys)), ys, CHART_MAX_POINTS)
+    return [dates[i] for i in keep], [ys[i] for i in keep]
+
+@st.cache_data(show_spinner=False)
+def contribution_bars(index, snapshot_mtime, window):
+    """ 各成分股近 window 個交易日的貢獻點數 (只取最後一天)；淨值快取沒涵蓋整個視窗時回傳空的 """
+    view = get_query(index).view()
+    names, points = view.contributions
+    if not names or len(view.dates) <= window:
+        return [], []
+    rolled = rolling_series("contribution", points, window, (index["id"], view.mtime))
+    if np.isnan(rolled[:, -1]).any():
+        return [], []
+    return list(names), rolled[:, -1].tolist()
+
+@st.cache_resource(show_spinner=False)
+def get_writer():
+    # 只有管理後台需要寫入端；所有使用者共用同一個，寫入依序執行 (所有指數共用一次抓取)
+    from core.writer import IndexWriter
+    return IndexWriter()
 
 # ==========================================
-# 2. 輔助函式：Plotly 看板
+# 3. 輔助函式：Plotly 看板
 # ==========================================
 def plot_indicator(title, value, suffix="", delta=None, color="#FFD700"):
     fig = go.Figure()
@@ -70,7 +125,7 @@ def plot_indicator(title, value, suffix="", delta=None, color="#FFD700"):
     return fig
 
 # ==========================================
-# 3. 輔助函式：Plotly 表格
+# 4. 輔助函式：Plotly 表格
 # ==========================================
 def plot_table(df):
     fig = go.Figure(data=[go.Table(
@@ -88,34 +143,27 @@ def plot_table(df):
     return fig
 
 # ==========================================
-# 4. 主程式邏輯
+# 5. 主程式邏輯
 # ==========================================
 st.title("🏆 台股基金五虎將指數")
 st.markdown("**TSF-Top5 Index** | 鎖定最強攻擊手・追求極致超額報酬")
 
-# --- A. 數據計算核心 ---
+# --- A. 數據讀取 (每日排程已預先算好，頁面只讀一個小檔案) ---
+indices = load_registry()
+index = indices[0]
+if len(indices) > 1:
+    index = st.selectbox("選擇指數", indices, format_func=lambda i: i["name"])
+
 try:
-    df_hist = engine.get_history()
-    if not df_hist.empty:
-        df_hist = df_hist.rename(columns={'date': 'Date', 'index_value': 'Value'})
-        df_hist['Date'] = pd.to_datetime(df_hist['Date'].astype(str), format='%Y%m%d')
-        latest_val = df_hist.iloc[-1]['Value']
-        last_updated_date = df_hist.iloc[-1]['Date'].strftime('%Y%m%d')
-        delta_val = 0.0
-        if len(df_hist) >= 2: delta_val = latest_val - df_hist.iloc[-2]['Value']
-        start_val = df_hist.iloc[0]['Value'] 
-        ytd_val = ((latest_val - start_val) / start_val) * 100
-        roll_max = df_hist['Value'].cummax()
-        drawdown = (df_hist['Value'] - roll_max) / roll_max
-        mdd_val = drawdown.min() * 100
-        df_hist['daily_ret'] = df_hist['Value'].pct_change()
-        sharpe_val = (df_hist['daily_ret'].mean() / df_hist['daily_ret'].std()) * (252**0.5) if df_hist['daily_ret'].std() != 0 else 0.0
-    else:
-        latest_val, delta_val, ytd_val, mdd_val, sharpe_val = 100.0, 0.0, 0.0, 0.0, 0.0
-        last_updated_date = "尚無資料"
+    # 整頁只用同一個版本的快照，數字前後一致
+    view = get_query(index).view()
+    kpis = view.kpis
+    latest_val, delta_val, ytd_val, mdd_val, sharpe_val = kpis["latest"], kpis["delta"], kpis["ytd"], kpis["mdd"], kpis["sharpe"]
+    last_updated_date = view.as_of or "尚無資料"
 except Exception as e:
     st.error(f"運算錯誤: {e}")
-    latest_val = 100.0
+    view = None
+    latest_val, delta_val, ytd_val, mdd_val, sharpe_val = 100.0, 0.0, 0.0, 0.0, 0.0
     last_updated_date = "N/A"
 
 st.markdown("---")
@@ -131,38 +179,81 @@ st.markdown("<br>", unsafe_allow_html=True)
 
 # --- C. 走勢圖 (標題現在會是亮白色) ---
 st.subheader("📈 指數走勢")
-if not df_hist.empty:
+if view and view.dates:
+    range_label = st.radio("區間", list(CHART_RANGES), index=len(CHART_RANGES) - 1, horizontal=True, label_visibility="collapsed")
+    resolution, xs, ys, bars = chart_points(index, view.mtime, CHART_RANGES[range_label])
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df_hist['Date'], y=df_hist['Value'], mode='lines', name='TSF-Top5', line=dict(color='#FFD700', width=3)))
+    if bars:
+        # 週 / 月線：畫收盤價，滑鼠移上去顯示該期的開高低
+        fig.add_trace(go.Scatter(
+            x=xs, y=ys, mode='lines', name=index["name"], line=dict(color='#FFD700', width=3),
+            customdata=[b[1:4] for b in bars],
+            hovertemplate="%{x}<br>收 %{y:.2f}<br>開 %{customdata[0]:.2f} 高 %{customdata[1]:.2f} 低 %{customdata[2]:.2f}<extra></extra>"
+        ))
+    else:
+        fig.add_trace(go.Scatter(x=xs, y=ys, mode='lines', name=index["name"], line=dict(color='#FFD700', width=3)))
+    st.caption({"daily": "日線", "lttb": "日線 (降採樣)", "weekly": "週線", "monthly": "月線"}[resolution])
     fig.update_layout(template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=450, margin=dict(l=10, r=10, t=30, b=10))
     st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("<br>", unsafe_allow_html=True)
 
-# --- D. 成分股表格 (標題現在會是亮白色) ---
+# --- D. 滾動分析 (指標與視窗都在 core.analytics 記憶，切換不會重算整段) ---
+st.subheader("📊 滾動分析")
+if view and len(view.dates) > min(ROLLING_WINDOWS):
+    col_roll1, col_roll2 = st.columns([1, 3])
+    with col_roll1:
+        metric = st.selectbox("指標", ROLLING_METRICS, format_func=ROLLING_LABELS.get)
+        windows = st.multiselect("視窗 (交易日)", ROLLING_WINDOWS, default=[20, 60])
+    with col_roll2:
+        fig = go.Figure()
+        for window in windows:
+            if len(view.dates) > window:
+                xs, ys = rolling_points(index, view.mtime, metric, window)
+                fig.add_trace(go.Scatter(x=xs, y=ys, mode='lines', name=f"{window} 日"))
+        fig.update_layout(template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=320, margin=dict(l=10, r=10, t=30, b=10))
+        st.plotly_chart(fig, use_container_width=True)
+
+    contrib_window = max([w for w in windows if len(view.dates) > w] or [min(ROLLING_WINDOWS)])
+    names, contrib = contribution_bars(index, view.mtime, contrib_window)
+    if names:
+        st.caption(f"近 {contrib_window} 個交易日各成分股對指數的貢獻 (點)")
+        fig = go.Figure(go.Bar(x=contrib, y=names, orientation='h', marker_color=['#FF4B4B' if c >= 0 else '#00FF00' for c in contrib]))
+        fig.update_layout(template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=260, margin=dict(l=10, r=10, t=10, b=10))
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.caption(f"成分股貢獻：淨值快取累積滿近 {contrib_window} 個交易日後提供。")
+else:
+    st.caption("資料累積超過 20 個交易日後提供滾動分析。")
+
+st.markdown("<br>", unsafe_allow_html=True)
+
+# --- E. 成分股表格 (標題現在會是亮白色) ---
 st.subheader("🛡️ 最新成分基金權重 (2026 H1)")
-today_str = datetime.now().strftime("%Y%m%d")
-_, components_data = engine.calculate_index(today_str)
-
-if isinstance(components_data, list) and len(components_data) > 0:
-    cons_data = pd.DataFrame(components_data)
-    cons_data = cons_data.rename(columns={'基金名稱': 'name', '最新淨值': 'nav', '權重': 'weight'})
-    formatted_data = pd.DataFrame({
-        "rank": range(1, len(cons_data) + 1),
-        "name": cons_data['name'],
-        "nav": cons_data['nav'].apply(lambda x: f"{float(x):.2f}" if pd.notnull(x) else "--"),
-        "weight": "20%"
-    })
+# 成分股淨值也在快照內，頁面重整不會連線公會
+components_data = view.constituents if view else ()
+
+if components_data:
+    formatted_data = {
+        "rank": list(range(1, len(components_data) + 1)),
+        "name": [c["name"] for c in components_data],
+        "nav": [f"{float(c['nav']):.2f}" if c["nav"] is not None else "--" for c in components_data],
+        "weight": [c["weight"] for c in components_data]
+    }
 else:
-    formatted_data = pd.DataFrame({
+    formatted_data = {
         "rank": [1, 2, 3, 4, 5],
         "name": ["統一奔騰基金 (王者)", "安聯台灣科技基金 (權值)", "路博邁台灣5G (新星)", "野村鴻運基金 (戰將)", "野村台灣運籌 (守門)"],
         "nav": ["--", "--", "--", "--", "--"],
         "weight": ["20%", "20%", "20%", "20%", "20%"]
-    })
+    }
 st.plotly_chart(plot_table(formatted_data), use_container_width=True)
+if components_data and view.nav_date:
+    # 淨值取自快取中成分股齊全的最新一天，可能比指數日期舊
+    nav_date = view.nav_date
+    st.caption(f"淨值日期: {nav_date[:4]}-{nav_date[4:6]}-{nav_date[6:]}" + ("" if nav_date == view.as_of else f" (指數日期: {view.as_of})"))
 
-# --- E. 簡報下載區 (標題現在會是亮白色) ---
+# --- F. 簡報下載區 (標題現在會是亮白色) ---
 st.markdown("---")
 st.subheader("📄 指數規格與簡報 (Presentation)")
 
@@ -184,7 +275,7 @@ if os.path.exists(pdf_path):
 else:
     st.warning("⚠️ 系統尚未偵測到簡報檔，請確認 `tsf_presentation.pdf` 已上傳至 GitHub。")
 
-# --- F. 管理後台 ---
+# --- G. 管理後台 ---
 st.markdown("---")
 with st.expander("⚙️ 管理員後台 (需密碼)"):
     password = st.text_input("請輸入管理員密碼", type="password")
@@ -192,12 +283,13 @@ with st.expander("⚙️ 管理員後台 (需密碼)"):
     if password == "8888":
         st.success("✅ 驗證成功！")
         st.info(f"📅 資料庫目前更新至: **{last_updated_date}**")
-        col_adm1, col_adm2 = st.columns(2)
+        writer = get_writer()
+        col_adm1, col_adm2, col_adm3 = st.columns(3)
         with col_adm1:
             st.write("#### 1. 重置 (危險)")
             base_date = st.text_input("輸入基期日期", "20260102")
             if st.button("🚀 執行初始化 (清空資料)"):
-                success, msg = engine.initialize_index(base_date)
+                success, msg = writer.initialize(index["id"], base_date)
                 if success: st.success(msg)
         with col_adm2:
             st.write("#### 2. 智慧補齊")
@@ -205,9 +297,33 @@ with st.expander("⚙️ 管理員後台 (需密碼)"):
             if st.button("🔥 開始批次補齊"):
                 pbar = st.progress(0)
                 status_txt = st.empty()
-                res = engine.run_batch_update(batch_end, lambda p, m: (pbar.progress(p), status_txt.text(m)))
+                res = writer.run_batch_update(batch_end, lambda p, m: (pbar.progress(p), status_txt.text(m)))
                 pbar.progress(100)
                 status_txt.text("Done!")
                 st.success(res)
+        with col_adm3:
+            st.write("#### 3. 向量化重算")
+            st.caption("修改設定檔 (units / rebalances) 後，用本地淨值快取重算整段歷史，不連線公會。")
+            if st.button("🧮 重算歷史"):
+                success, msg = writer.recompute(index["id"])
+                if success: st.success(msg)
+                else: st.error(msg)
+
+        st.write("#### 4. 成分股篩選 (全市場)")
+        from core.universe import NavArchive, SCREEN_METRICS
+        archive = NavArchive()
+        if len(archive) < 2:
+            st.caption("尚無全市場淨值存檔：排程設定 TSF_ARCHIVE_UNIVERSE=1 後，每次爬取會一併存下所有基金的淨值。")
+        else:
+            col_scr1, col_scr2, col_scr3 = st.columns(3)
+            with col_scr1: metric = st.selectbox("排序指標", SCREEN_METRICS, format_func=lambda m: {"return": "報酬", "volatility": "波動 (低→高)", "drawdown": "最大回撤", "sharpe": "Sharpe"}[m])
+            with col_scr2: window = st.number_input("回看交易日數", min(20, len(archive) - 1), len(archive) - 1, min(252, len(archive) - 1))
+            with col_scr3: top = st.number_input("顯示前幾名", 1, 50, 10)
+            ranked = archive.screen(metric, window=int(window), top=int(top))
+            st.dataframe(
+                [{"基金名稱": r["name"], "報酬%": round(r["return"], 2), "年化波動%": round(r["volatility"], 2),
+                  "最大回撤%": round(r["drawdown"], 2), "Sharpe": round(r["sharpe"], 2)} for r in ranked],
+                use_container_width=True
+            )
     elif password:
         st.error("❌ 密碼錯誤。")
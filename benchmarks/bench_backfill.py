@@ -0,0 +1,126 @@
+"""
+端到端補齊基準測試：仿真伺服器 → 爬蟲 → 引擎 → 歷史檔 (完全離線，不碰 data/)
+1. run_batch_update 全流程 (併發 + 限速) 的總時間
+2. 逐日分段計時：fetch (HTTP) / parse / compute / append / flush 各自的總計、平均、p50、p95
+
+用法: python -m benchmarks.bench_backfill --years 3 --latency-ms 30 [--json result.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "total_ms": sum(samples) * 1000,
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--years', type=float, default=3)
+    ap.add_argument('--end', default='20251231', help='補齊結束日 (YYYYMMDD)')
+    ap.add_argument('--latency-ms', type=float, default=30)
+    ap.add_argument('--jitter-ms', type=float, default=10)
+    ap.add_argument('--funds', type=int, default=1500)
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--rate', type=float, default=0, help='令牌桶速率 (次/秒)，0 代表不限速')
+    ap.add_argument('--json', help='把結果寫成 JSON，方便與前次比較')
+    args = ap.parse_args()
+
+    # 必須在載入 core 之前設定：資料寫到暫存目錄、網址指向仿真伺服器
+    from benchmarks.sitca_standin import start_standin
+    server = start_standin(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, n_funds=args.funds)
+    os.environ["TSF_DATA_DIR"] = tempfile.mkdtemp(prefix="tsf_bench_")
+    os.environ["TSF_SITCA_URL"] = server.url
+
+    from core.engine import IndexEngine
+    from core.history import HistoryStore
+    from core.scraper import SitcaScraper
+
+    end = datetime.strptime(args.end, "%Y%m%d")
+    base = end - timedelta(days=int(args.years * 365))
+    while server.is_closed(base.strftime("%Y%m%d")):
+        base += timedelta(days=1)
+    base_str = base.strftime("%Y%m%d")
+
+    engine = IndexEngine()
+    engine.scraper = SitcaScraper(rate_limit=args.rate, burst=args.workers, url=server.url, workers=args.workers)
+    ok, msg = engine.initialize_index(base_str)
+    if not ok:
+        print(msg)
+        return
+    print(f"🧪 仿真伺服器 {server.url} | 延遲 {args.latency_ms}±{args.jitter_ms} ms | 每頁 {args.funds} 檔")
+    print(f"📅 補齊區間 {base_str} -> {args.end} | workers={args.workers} rate={args.rate or '不限'}")
+
+    # 1. 全流程
+    t0 = time.perf_counter()
+    result = engine.run_batch_update(args.end)
+    batch_total = time.perf_counter() - t0
+    print(f"🚀 run_batch_update: {batch_total:.2f} s | {result}")
+
+    # 2. 逐日分段 (循序、無快取，量每個階段本身的成本)
+    scraper = SitcaScraper(rate_limit=0, url=server.url)
+    history = HistoryStore(os.path.join(os.environ["TSF_DATA_DIR"], "phase_history.csv"))
+    config = engine._load_config()
+    phases = {"fetch": [], "parse": [], "compute": [], "append": [], "flush": []}
+    days = engine.calendar.trading_days(base + timedelta(days=1), end)
+    t_all = time.perf_counter()
+    for d_str in days:
+        t = time.perf_counter()
+        html = scraper.fetch_page(d_str)
+        phases["fetch"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        navs = scraper.parser.parse(html or "")
+        phases["parse"].append(time.perf_counter() - t)
+        if not navs:
+            continue
+
+        t = time.perf_counter()
+        value, _ = engine._compute(config, navs, d_str)
+        phases["compute"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        history.append(d_str, value, commit=False)
+        phases["append"].append(time.perf_counter() - t)
+    t = time.perf_counter()
+    history.flush()
+    phases["flush"].append(time.perf_counter() - t)
+    sequential_total = time.perf_counter() - t_all
+
+    report = {
+        "args": vars(args),
+        "days": len(days),
+        "batch_total_s": batch_total,
+        "sequential_total_s": sequential_total,
+        "phases": {name: summarize(samples) for name, samples in phases.items()},
+        "server": dict(server.stats),
+    }
+    print(f"🐢 逐日循序: {sequential_total:.2f} s ({len(days)} 個交易日)")
+    print(f"{'階段':<8}{'次數':>6}{'總計ms':>12}{'平均ms':>10}{'p50ms':>10}{'p95ms':>10}")
+    for name, st in report["phases"].items():
+        print(f"{name:<8}{st['count']:>6}{st['total_ms']:>12.1f}{st['mean_ms']:>10.3f}{st['p50_ms']:>10.3f}{st['p95_ms']:>10.3f}")
+    print(f"🌐 伺服器: GET {server.stats['GET']} 次, POST {server.stats['POST']} 次, 傳輸 {server.stats['bytes'] / 1e6:.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+""" 
+淨值頁解析基準測試：舊版 BeautifulSoup 全頁解析 vs. 專用解析器
+用法: python -m benchmarks.bench_parser [--html 錄製的頁面.html] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import TARGET_FUNDS
+from core.parser import NavTableParser, parse_hidden_inputs
+from benchmarks.sitca_page import build_page
+
+def legacy_parse(html):
+    """ 舊版 fetch_data 的解析流程 (需安裝 beautifulsoup4) """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    {tag.get('name'): tag.get('value', '') for tag in soup.find_all('input') if tag.get('name')}
+    tables = soup.find_all('table')
+    data_table = next((t for t in tables if "基金名稱" in t.text and "淨值" in t.text), None)
+    if not data_table:
+        return None
+    results = {}
+    for row in data_table.find_all('tr'):
+        text = row.text
+        for name, keywords in TARGET_FUNDS.items():
+            if keywords[0] in text:
+                if len(keywords) > 1 and not any(k in text for k in keywords[1:]):
+                    continue
+                col_texts = [c.text.strip() for c in row.find_all('td')]
+                for i, val in enumerate(col_texts):
+                    if val == 'TWD' and i+1 < len(col_texts):
+                        try:
+                            results[name] = float(col_texts[i+1].replace(',', ''))
+                        except ValueError: pass
+                        break
+    return results
+
+def fast_parse(html, parser=NavTableParser()):
+    parse_hidden_inputs(html)
+    return parser.parse(html)
+
+def measure(func, html, repeat):
+    """ 回傳 (最佳耗時秒數, 峰值記憶體 bytes, 解析結果) """
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(html)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--html', help='錄製的公會回應頁 (未給則產生仿真頁面)')
+    ap.add_argument('--funds', type=int, default=1500, help='仿真頁面的基金列數')
+    ap.add_argument('--repeat', type=int, default=20)
+    args = ap.parse_args()
+
+    if args.html:
+        with open(args.html, 'r', encoding='utf-8') as f:
+            html = f.read()
+    else:
+        html = build_page("20260417", n_funds=args.funds)
+    print(f"📄 頁面大小: {len(html.encode('utf-8')) / 1024:.0f} KB")
+
+    fast_t, fast_mem, fast_res = measure(fast_parse, html, args.repeat)
+    print(f"⚡ 專用解析器: {fast_t * 1000:8.2f} ms | 峰值記憶體 {fast_mem / 1024:8.0f} KB | {len(fast_res or {})} 檔")
+
+    try:
+        legacy_t, legacy_mem, legacy_res = measure(legacy_parse, html, max(1, args.repeat // 4))
+    except ImportError:
+        print("⚠️ 未安裝 beautifulsoup4，略過舊版比較")
+        return
+    print(f"🐢 BeautifulSoup: {legacy_t * 1000:8.2f} ms | 峰值記憶體 {legacy_mem / 1024:8.0f} KB | {len(legacy_res or {})} 檔")
+    print(f"📊 加速 {legacy_t / fast_t:.1f}x，記憶體減少 {legacy_mem / max(fast_mem, 1):.1f}x，結果{'一致' if legacy_res == fast_res else '不一致 ❌'}")
+
+if __name__ == "__main__":
+    main()
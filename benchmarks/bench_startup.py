@@ -0,0 +1,80 @@
+"""
+每日排程冷啟動基準測試：每次都開一個全新的 Python 行程跑完整的 run_daily_update.py
+(複製一份 data/ 到暫存目錄、網址指向仿真伺服器，不碰正式資料)，量牆鐘時間與峰值記憶體 (max RSS)
+- baseline: 只啟動直譯器 (python -c pass)
+- fast:     目前的每日流程 (只用標準函式庫 + requests)
+- legacy:   同一流程但先 import pandas / numpy (模擬舊版經由 core.engine 載入 pandas 的成本)
+
+用法: python -m benchmarks.bench_startup --runs 5 [--date 20260420] [--json result.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VARIANTS = {
+    "baseline": ["-c", "pass"],
+    "fast": ["run_daily_update.py"],
+    "legacy": ["-c", "import pandas, numpy, runpy; runpy.run_path('run_daily_update.py', run_name='__main__')"],
+}
+
+def run_once(argv, env):
+    """ 執行一個子行程，回傳 (秒數, max RSS MB) """
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, *argv], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - t0
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(proc.stderr.read().decode('utf-8', 'replace'))
+    return elapsed, usage.ru_maxrss / 1024 # Linux 的 ru_maxrss 單位是 KB
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--runs', type=int, default=5)
+    ap.add_argument('--date', default='20260420', help='每次計算的日期 (需晚於 data/ 歷史的最後一天)')
+    ap.add_argument('--json', help='把結果寫成 JSON，方便與前次比較')
+    args = ap.parse_args()
+
+    from benchmarks.sitca_standin import start_standin
+    server = start_standin(latency_ms=0, jitter_ms=0)
+    results = {}
+    for name, argv in VARIANTS.items():
+        if name != "baseline":
+            argv = [*argv, "--date", args.date] # -c 模式下 runpy 執行的腳本同樣讀得到 sys.argv
+        samples = []
+        for _ in range(args.runs):
+            # 每次都用一份乾淨的 data/，確保每次都真的抓一天、算一天、寫一天
+            data_dir = tempfile.mkdtemp(prefix="tsf_startup_")
+            shutil.copytree(os.path.join(ROOT, 'data'), data_dir, dirs_exist_ok=True)
+            env = {**os.environ, "TSF_DATA_DIR": data_dir, "TSF_SITCA_URL": server.url}
+            env.pop("TSF_TRACE_FILE", None)
+            samples.append(run_once(argv, env))
+            shutil.rmtree(data_dir, ignore_errors=True)
+        times = sorted(t for t, _ in samples)
+        results[name] = {
+            "runs": len(samples),
+            "median_ms": times[len(times) // 2] * 1000,
+            "min_ms": times[0] * 1000,
+            "max_rss_mb": max(rss for _, rss in samples),
+        }
+
+    print(f"{'流程':<10}{'次數':>6}{'中位數ms':>12}{'最快ms':>10}{'峰值RSS MB':>14}")
+    for name, st in results.items():
+        print(f"{name:<10}{st['runs']:>6}{st['median_ms']:>12.1f}{st['min_ms']:>10.1f}{st['max_rss_mb']:>14.1f}")
+    fast, legacy = results["fast"], results["legacy"]
+    print(f"🚀 fast 對 legacy：時間 {legacy['median_ms'] / fast['median_ms']:.1f}x 快，記憶體少 {legacy['max_rss_mb'] - fast['max_rss_mb']:.0f} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2, ensure_ascii=False)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+""" 產生仿公會 IN2106.aspx 淨值頁的 HTML (供基準測試與離線測試使用) """
+import random
+from html import escape
+
+# 成分股在頁面上的完整名稱 (需能被 TARGET_FUNDS 關鍵字命中)
+TARGET_ROWS = {
+    "統一奔騰": "統一奔騰基金",
+    "安聯台灣科技": "安聯台灣科技基金",
+    "路博邁台灣5G": "路博邁台灣5G股票基金T累積型(新台幣)",
+    "野村鴻運": "野村鴻運基金",
+    "野村台灣運籌": "野村台灣運籌基金",
+}
+
+# 投信下拉選單 (成分股所屬的四家 + 其他填充用的公司)；填充基金依序分配給後面的公司
+TARGET_COMPANIES = {"統一奔騰": "A0009", "安聯台灣科技": "A0022", "路博邁台灣5G": "A0045", "野村鴻運": "A0005", "野村台灣運籌": "A0005"}
+COMPANIES = {"A0005": "A0005 野村投信", "A0009": "A0009 統一投信", "A0022": "A0022 安聯投信", "A0045": "A0045 路博邁投信"}
+COMPANIES.update({f"B{k:04d}": f"B{k:04d} 測試{k}號投信" for k in range(36)})
+_FILLER_COMPANIES = [c for c in COMPANIES if c.startswith("B")]
+
+def build_page(date_str, target_navs=None, n_funds=1500, holiday=False, seed=0, comid=""):
+    """
+    target_navs: Dict {'統一奔騰': 411.15, ...}，未給則隨機產生
+    holiday=True 時只回傳表單 (公會查無資料的樣子)
+    comid: 投信代號，只列出該公司的基金 (空字串為全部)
+    """
+    rng = random.Random(f"{seed}-{date_str}")
+    viewstate = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/") for _ in range(6000))
+    parts = [
+        "<html><head><title>基金淨值</title></head><body>",
+        '<form method="post" action="./IN2106.aspx?pid=IN2213_02" id="aspnetForm">',
+        f'<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />',
+        '<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="8A7B1C2D" />',
+        f'<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{viewstate[:800]}" />',
+        '<table width="100%"><tr><td>',
+        f'<input name="ctl00$ContentPlaceHolder1$txtQ_Date" type="text" value="{date_str}" />',
+        '<select name="ctl00$ContentPlaceHolder1$ddlQ_Comid"><option value="">全部</option>'
+        + "".join(f'<option value="{value}">{escape(label)}</option>' for value, label in COMPANIES.items()) + '</select>',
+        '<input type="submit" name="ctl00$ContentPlaceHolder1$BtnQuery" value="查詢" />',
+        '</td></tr></table>',
+    ]
+    if not holiday:
+        parts.append('<table class="DTeven" cellspacing="0" border="1">')
+        parts.append("<tr><th>基金代號</th><th>基金名稱</th><th>幣別</th><th>淨值</th><th>日期</th></tr>")
+        rows = []
+        for i in range(n_funds):
+            k = i % len(_FILLER_COMPANIES)
+            rows.append((f"A{i:05d}", f"測試{k}號投信第{i}號全球平衡基金", rng.uniform(8, 80), _FILLER_COMPANIES[k]))
+        for name, full_name in TARGET_ROWS.items():
+            nav = (target_navs or {}).get(name, round(rng.uniform(30, 450), 2))
+            rows.insert(rng.randrange(len(rows) + 1), (f"T{len(rows):05d}", full_name, nav, TARGET_COMPANIES[name]))
+        for code, name, nav, company in rows:
+            if comid and company != comid:
+                continue
+            parts.append(
+                f'<tr class="DTodd"><td>{code}</td><td><a href="#">{escape(name)}</a></td>'
+                f'<td>TWD</td><td align="right">{nav:,.2f}</td><td>{date_str}</td></tr>'
+            )
+        parts.append("</table>")
+    parts.append("</form></body></html>")
+    return "\n".join(parts)
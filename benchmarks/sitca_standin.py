@@ -0,0 +1,144 @@
+"""
+公會 IN2106.aspx 的本地仿真伺服器 (離線測試與基準測試用)
+- GET 回傳帶 __VIEWSTATE 的查詢表單；POST 缺 ViewState 回 500，模擬 ASP.NET 的驗證
+- 週末與 --holiday-rate 比例的平日回傳「查無資料」頁面
+- 投信下拉選單 (ddlQ_Comid) 有選公司時只列出該公司的基金
+- --fixtures 目錄下有 <日期>.html 時優先回傳錄製檔 (僅限查詢全部)
+- --latency-ms / --jitter-ms 注入延遲
+
+用法: python -m benchmarks.sitca_standin --port 8765 --latency-ms 80
+      TSF_SITCA_URL=http://127.0.0.1:8765/ROC/Industry/IN2106.aspx python run_daily_update.py
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sitca_page import TARGET_ROWS, build_page
+
+PATH = "/ROC/Industry/IN2106.aspx"
+DATE_FIELD = 'ctl00$ContentPlaceHolder1$txtQ_Date'
+COMID_FIELD = 'ctl00$ContentPlaceHolder1$ddlQ_Comid'
+
+def synthetic_navs(date_str):
+    """ 成分股的確定性淨值 (同一天每次都一樣，方便比對重算結果) """
+    day = datetime.strptime(date_str, "%Y%m%d").toordinal()
+    navs = {}
+    for k, name in enumerate(TARGET_ROWS):
+        base = 40 + 90 * k
+        noise = (zlib.crc32(f"{name}{date_str}".encode()) % 1000) / 1000 - 0.5
+        navs[name] = round(base * (1 + 0.25 * math.sin(day / 45 + k) + 0.0004 * (day % 3650) + 0.01 * noise), 2)
+    return navs
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0, jitter_ms=0, holiday_rate=0.04, n_funds=1500, fixtures_dir=None):
+        super().__init__(address, StandinHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.holiday_rate = holiday_rate
+        self.n_funds = n_funds
+        self.fixtures_dir = fixtures_dir
+        self.stats = {"GET": 0, "POST": 0, "bytes": 0}
+        self._lock = threading.Lock()
+        self._page = lru_cache(maxsize=4096)(self._build)
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}{PATH}"
+
+    def is_closed(self, date_str):
+        dt = datetime.strptime(date_str, "%Y%m%d")
+        if dt.weekday() >= 5:
+            return True
+        return (zlib.crc32(f"closed{date_str}".encode()) % 10000) / 10000 < self.holiday_rate
+
+    def page_for(self, date_str, comid=""):
+        if self.fixtures_dir and not comid:
+            path = os.path.join(self.fixtures_dir, f"{date_str}.html")
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return f.read()
+        return self._page(date_str, comid)
+
+    def _build(self, date_str, comid):
+        if self.is_closed(date_str):
+            return build_page(date_str, holiday=True)
+        return build_page(date_str, synthetic_navs(date_str), n_funds=self.n_funds, comid=comid)
+
+    def count(self, method, n_bytes):
+        with self._lock:
+            self.stats[method] += 1
+            self.stats["bytes"] += n_bytes
+
+class StandinHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._delay()
+        self._send(200, build_page(datetime.now().strftime("%Y%m%d"), holiday=True), "GET")
+
+    def do_POST(self):
+        self._delay()
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        form = {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+        if not form.get('__VIEWSTATE'):
+            self._send(500, "<html><body>Invalid ViewState</body></html>", "POST")
+            return
+        date_str = form.get(DATE_FIELD, '')
+        try:
+            page = self.server.page_for(date_str, form.get(COMID_FIELD, ''))
+        except ValueError:
+            page = build_page(date_str, holiday=True)
+        self._send(200, page, "POST")
+
+    def _delay(self):
+        srv = self.server
+        if srv.latency_ms or srv.jitter_ms:
+            time.sleep((srv.latency_ms + random.uniform(0, srv.jitter_ms)) / 1000)
+
+    def _send(self, status, html, method):
+        data = html.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(method, len(data))
+
+    def log_message(self, format, *args):
+        pass # 不印每個請求，避免干擾基準測試輸出
+
+def start_standin(port=0, **options):
+    """ 在背景執行緒啟動仿真伺服器，回傳 server (server.url 為查詢網址) """
+    server = StandinServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--latency-ms', type=float, default=0)
+    ap.add_argument('--jitter-ms', type=float, default=0)
+    ap.add_argument('--holiday-rate', type=float, default=0.04, help='平日休市 (查無資料) 的比例')
+    ap.add_argument('--funds', type=int, default=1500, help='每頁的基金列數')
+    ap.add_argument('--fixtures', help='錄製檔目錄 (<日期>.html)')
+    args = ap.parse_args()
+    server = StandinServer(("127.0.0.1", args.port), args.latency_ms, args.jitter_ms, args.holiday_rate, args.funds, args.fixtures)
+    print(f"🧪 仿真伺服器啟動: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# 滾動視窗分析 (NumPy 向量化，每個視窗都是 O(n))：
+# - 平均 / 標準差用累積和 (cumsum) 相減，不需逐窗重算
+# - 視窗最高點用 van Herk / Gil-Werman 分塊前後綴最大值，與視窗長度無關
+# 結果以 (序列版本, 指標, 視窗) 為鍵記憶，看板重整、切換視窗都不會重算
+
+TRADING_DAYS = 252
+ROLLING_METRICS = ("return", "volatility", "sharpe", "drawdown")
+_MEMO_SIZE = 256
+
+def _window_sums(x, window):
+    """ 每個位置 (含) 往前 window 個值的總和；不足 window 個為 NaN """
+    out = np.full(len(x), np.nan)
+    if window <= len(x):
+        c = np.concatenate(([0.0], np.cumsum(x)))
+        out[window - 1:] = c[window:] - c[:-window]
+    return out
+
+def _rolling_max(x, window):
+    """ 每個位置 (含) 往前 window 個值的最大值 (O(n))；不足 window 個為 NaN """
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window > n:
+        return out
+    pad = (-n) % window
+    blocks = np.concatenate([x, np.full(pad, -np.inf)]).reshape(-1, window)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    end = np.arange(window - 1, n)
+    out[window - 1:] = np.maximum(suffix[end - window + 1], prefix[end])
+    return out
+
+def _daily_returns(values):
+    """ 與指數值對齊的日報酬 (第一天為 NaN) """
+    v = np.asarray(values, dtype=float)
+    rets = np.full(len(v), np.nan)
+    rets[1:] = v[1:] / v[:-1] - 1
+    return rets
+
+def rolling_return(values, window):
+    """ 近 window 個交易日的累積報酬 (%) """
+    v = np.asarray(values, dtype=float)
+    out = np.full(len(v), np.nan)
+    if window < len(v):
+        out[window:] = (v[window:] / v[:-window] - 1) * 100
+    return out
+
+def _rolling_mean_std(values, window):
+    """ 近 window 個日報酬的平均與樣本標準差 (ddof=1)，先減去全期平均避免累積和相減的誤差 """
+    rets = _daily_returns(values)[1:]
+    out_mean, out_std = np.full(len(values), np.nan), np.full(len(values), np.nan)
+    if window < 2 or window > len(rets):
+        return out_mean, out_std
+    shift = rets.mean()
+    x = rets - shift
+    s1, s2 = _window_sums(x, window), _window_sums(x * x, window)
+    var = np.maximum(s2 - s1 * s1 / window, 0) / (window - 1)
+    out_mean[1:] = s1 / window + shift
+    out_std[1:] = np.sqrt(var)
+    return out_mean, out_std
+
+def rolling_volatility(values, window):
+    """ 近 window 個日報酬的年化波動 (%) """
+    return _rolling_mean_std(values, window)[1] * np.sqrt(TRADING_DAYS) * 100
+
+def rolling_sharpe(values, window):
+    """ 近 window 個日報酬的年化 Sharpe (無風險利率以 0 計，與看板 KPI 相同) """
+    mean, std = _rolling_mean_std(values, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(std > 0, mean / std * np.sqrt(TRADING_DAYS), np.nan)
+
+def rolling_drawdown(values, window):
+    """ 相對近 window 個交易日最高點的回撤 (%) """
+    v = np.asarray(values, dtype=float)
+    return (v / _rolling_max(v, window) - 1) * 100
+
+def rolling_contribution(points, window):
+    """
+    各成分股近 window 個交易日對指數點數的貢獻
+    points: 基金 × 日期 的每日貢獻點數 (snapshot 的 contributions，缺資料為 None / NaN)
+    輸出同形狀，加總等於該期間指數變動；視窗內有任何一天缺資料即為 NaN
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    out = np.full(points.shape, np.nan)
+    if 0 < window < points.shape[1]:
+        missing = np.isnan(points)
+        c = np.cumsum(np.where(missing, 0.0, points), axis=1)
+        gaps = np.cumsum(missing, axis=1)
+        covered = gaps[:, window:] == gaps[:, :-window]
+        out[:, window:] = np.where(covered, c[:, window:] - c[:, :-window], np.nan)
+    return out
+
+_ROLLING = {
+    "return": rolling_return,
+    "volatility": rolling_volatility,
+    "sharpe": rolling_sharpe,
+    "drawdown": rolling_drawdown,
+    "contribution": rolling_contribution,
+}
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+def rolling_series(metric, series, window, version):
+    """
+    記憶版：同一序列版本 (例如快照的檔案時間) 與視窗只算一次
+    version 必須能代表序列內容 (內容變了版本就要變)；回傳的陣列是唯讀的，請勿就地修改
+    """
+    key = (version, metric, int(window))
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    result = _ROLLING[metric](series, int(window))
+    result.setflags(write=False)
+    with _memo_lock:
+        _memo[key] = result
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+    return result
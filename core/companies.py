@@ -0,0 +1,101 @@
+import json
+import os
+import re
+import threading
+from .config import COMPANY_MAP_FILE, FUND_COMPANY_HINTS
+from .storage import mtime, changed, atomic_write_json
+
+# 公司全名的常見尾巴，去掉後剩下的簡稱通常就是基金名稱的開頭 (例如「野村投信」-> 「野村」)
+_SUFFIX_RE = re.compile(r'(證券投資信託(股份)?(有限)?公司|投信|投顧)$')
+_CODE_RE = re.compile(r'^[A-Za-z0-9]+\s*')
+
+def company_short_name(label):
+    """ 下拉選單文字 -> 公司簡稱："A0009 統一證券投資信託股份有限公司" -> "統一" """
+    return _SUFFIX_RE.sub('', _CODE_RE.sub('', label.strip())).strip()
+
+class CompanyMap:
+    """
+    成分股 -> 公會查詢用的投信代號 (ddlQ_Comid)，存在 data/fund_companies.json
+    - 由查詢頁的投信下拉選單自動比對：公司簡稱為主關鍵字開頭者 (取最長的)，或 config.FUND_COMPANY_HINTS 指定的名稱片段
+    - 值為 null 代表「已確認對應不到」，該基金改走全部查詢
+    多執行緒共用 (批次補齊時各執行緒同時查詢)
+    """
+    def __init__(self, path=COMPANY_MAP_FILE, hints=FUND_COMPANY_HINTS):
+        self.path = path
+        self.hints = hints
+        self._data = None
+        self._dirty = False
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def groups(self, target_funds):
+        """
+        依公司分組 {投信代號: [成分股...]}；只要有一檔尚未對應或對應不到就回傳 None (改查全部)
+        """
+        data = self._load()
+        groups = {}
+        for name in target_funds:
+            comid = data.get(name)
+            if not comid:
+                return None
+            groups.setdefault(comid, []).append(name)
+        return groups
+
+    def learn(self, options, target_funds):
+        """ 用下拉選單 {代號: 文字} 補上尚未對應的成分股 (已對應的不變) """
+        options = {value: label for value, label in options.items() if value}
+        if not options:
+            return
+        with self._lock:
+            data = self._load()
+            for name, keywords in target_funds.items():
+                if name in data:
+                    continue
+                data[name] = self._match(name, keywords, options)
+                self._dirty = True
+
+    def forget(self, names):
+        """ 公司篩選查不到、全部查詢卻查得到：對應有誤，之後改走全部查詢 """
+        with self._lock:
+            data = self._load()
+            for name in names:
+                data[name] = None
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            atomic_write_json(self.path, self._data, indent=1, ensure_ascii=False, sort_keys=True)
+            self._mtime = mtime(self.path)
+            self._dirty = False
+
+    def refresh(self):
+        """ 檔案被其他行程改過 (且沒有未寫入的對應) 時，下次使用重新讀檔 """
+        with self._lock:
+            if self._data is not None and not self._dirty and changed(self.path, self._mtime):
+                self._data = None
+
+    def _match(self, name, keywords, options):
+        hint = self.hints.get(name)
+        best, best_len = None, 0
+        for value, label in options.items():
+            short = company_short_name(label)
+            if not short:
+                continue
+            hit = hint in label if hint else keywords[0].startswith(short)
+            if hit and len(short) > best_len:
+                best, best_len = value, len(short)
+        return best
+
+    def _load(self):
+        if self._data is None:
+            self._data = {}
+            self._mtime = mtime(self.path)
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"CompanyMap Error: {e}") # 壞掉就重新比對
+        return self._data
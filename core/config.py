@@ -2,11 +2,56 @@ import os
 
 # 專案路徑設定
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-INDEX_CONFIG_FILE = os.path.join(BASE_DIR, 'data', 'tsf_index_config.json') # 儲存成分股權重
-HISTORY_FILE = os.path.join(BASE_DIR, 'data', 'tsf_history.csv')           # 儲存每日指數點位 (新增這項以便畫圖)
+DATA_DIR = os.environ.get("TSF_DATA_DIR", os.path.join(BASE_DIR, 'data'))   # 可用環境變數改到暫存目錄 (離線測試/基準測試用)
+INDEX_REGISTRY_FILE = os.path.join(DATA_DIR, 'index_registry.json') # 指數清單 (每個指數各自的設定/歷史檔)
+INDEX_CONFIG_FILE = os.path.join(DATA_DIR, 'tsf_index_config.json') # 儲存成分股權重
+HISTORY_FILE = os.path.join(DATA_DIR, 'tsf_history.csv')           # 儲存每日指數點位 (新增這項以便畫圖)
+NAV_CACHE_FILE = os.path.join(DATA_DIR, 'nav_cache.json')          # 儲存每日成分股淨值 (本地快取，避免重複爬取)
+HOLIDAY_FILE = os.path.join(DATA_DIR, 'tw_holidays.txt')           # 休市日種子資料 (可手動維護)
+CLOSED_DAYS_FILE = os.path.join(DATA_DIR, 'closed_days.json')      # 查無資料而學到的休市日 (負向快取)
+SNAPSHOT_FILE = os.path.join(DATA_DIR, 'dashboard_snapshot.json') # 前端看板快照 (每日排程產生)
+METRICS_STATE_FILE = os.path.join(DATA_DIR, 'metrics_state.json')  # 看板指標的增量狀態 (每列 checksum + 累積值)
+COMPANY_MAP_FILE = os.path.join(DATA_DIR, 'fund_companies.json')   # 成分股 -> 投信公司代號 (依公司篩選查詢用)
+PUBLICATION_LOG_FILE = os.path.join(DATA_DIR, 'publication_log.json') # 每日淨值公布時間 (調整排程用)
+WRITE_LOCK_FILE = os.path.join(DATA_DIR, '.write.lock')              # 寫入端互斥鎖 (排程與網頁後台不會同時改檔)
+RAW_ARCHIVE_DIR = os.path.join(DATA_DIR, 'raw')                     # 公會原始頁面存檔 (<sha256>.html.gz + index.json)
+UNIVERSE_DIR = os.path.join(DATA_DIR, 'universe')                # 全市場淨值欄式檔 (funds.json / chunks.json / navs-<序號>.npy，只新增不改寫)
+
+# 交易日曆設定
+CLOSED_DAY_TTL_DAYS = 180      # 已確認休市的舊日期，負向快取保留天數
+RECENT_CLOSED_TTL_HOURS = 6    # 近 3 日查無資料可能只是尚未公布，只快取幾小時
+
+# 效能記錄 (設定 TSF_TRACE_FILE 才會開啟，輸出 JSON Lines)
+TRACE_FILE = os.environ.get("TSF_TRACE_FILE")
+
+# 全市場淨值存檔 (成分股篩選用)：開啟後每次爬到的頁面會把所有基金的淨值一併存下
+ARCHIVE_UNIVERSE = os.environ.get("TSF_ARCHIVE_UNIVERSE", "") == "1"
+# 原始頁面存檔 (規則改了可用 run_reingest.py 離線重建)：開啟後每次查詢的回應都壓縮存下
+ARCHIVE_RAW = os.environ.get("TSF_ARCHIVE_RAW", "") == "1"
+SCREEN_WINDOW = 252            # 篩選預設回看交易日數 (約一年)
+SCREEN_MIN_COVERAGE = 0.9      # 回看期間至少要有幾成的日子有淨值才列入排名
+
+# 走勢圖設定：送到瀏覽器的點數上限 (超過時改用 LTTB 降採樣或週 / 月 K 棒)
+CHART_MAX_POINTS = 500
+
+# 公布輪詢設定 (run_daily_update.py --poll)：提早開始，查不到就指數退避 + 抖動後再查
+POLL_BASE_INTERVAL = 300       # 最短等待秒數 (開始部分公布後也回到這個間隔)
+POLL_MAX_INTERVAL = 1800       # 最長等待秒數
+POLL_BACKOFF = 1.5             # 每次查不到，間隔乘上的倍數
+POLL_JITTER = 0.2              # 間隔隨機 ±20%
+POLL_UNTIL = "22:00"           # 預設輪詢截止時間 (台灣時間)
+
+# 歷史檔寫入設定
+HISTORY_FLUSH_EVERY = 50       # 批次補齊時每累積幾筆寫檔一次 (中途中斷也保得住進度)
 
 # SITCA 爬蟲設定
-SITCA_URL = "https://www.sitca.org.tw/ROC/Industry/IN2106.aspx?pid=IN2213_02"
+SITCA_URL = os.environ.get("TSF_SITCA_URL", "https://www.sitca.org.tw/ROC/Industry/IN2106.aspx?pid=IN2213_02") # 可指向本地仿真伺服器
+SITCA_RATE_LIMIT = 2.0   # 對公會的平均請求速率上限 (次/秒)，取代固定 sleep
+SITCA_RATE_BURST = 2     # 令牌桶容量 (允許的瞬間請求數)
+BATCH_WORKERS = 4        # 批次補齊時的同時連線數上限
+COMPANY_FILTER = True    # 依成分股所屬投信分別查詢 (回應只有該公司的基金，小一個數量級)；對應不到時改查全部
+# 投信名稱提示 {成分股: 公司名稱片段}：基金名稱開頭不是公司簡稱時才需要設定
+FUND_COMPANY_HINTS = {}
 
 # 成分股定義 (Name: [Keywords])
 TARGET_FUNDS = {
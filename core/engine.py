@@ -1,71 +1,292 @@
 import json
 import os
-import time
-import pandas as pd
 from datetime import datetime, timedelta
-from .config import INDEX_CONFIG_FILE, HISTORY_FILE
 from .scraper import SitcaScraper
+from .nav_cache import NavCache
+from .trading_calendar import TradingCalendar
+from .history import HistoryStore
+from .snapshot import build_snapshot
+from .metrics import MetricsState
+from .storage import atomic_write_json
+from .tracing import span, tracer
+from .registry import default_index, fund_keywords
+from .config import TARGET_FUNDS, ARCHIVE_UNIVERSE, ARCHIVE_RAW
+
+_UNSET = object() # 標記「尚未抓取」，與抓取結果 None (查無資料) 區分
+
+def new_archive():
+    """ 設定開啟全市場存檔時回傳 NavArchive (numpy 只在開啟時載入)，否則 None """
+    if not ARCHIVE_UNIVERSE:
+        return None
+    from .universe import NavArchive
+    return NavArchive()
+
+def new_raw_archive():
+    """ 設定開啟原始頁面存檔時回傳 RawArchive，否則 None """
+    if not ARCHIVE_RAW:
+        return None
+    from .raw_archive import RawArchive
+    return RawArchive()
+
+def run_fan_out(plans, scraper, nav_cache, calendar, progress_callback=None):
+    """
+    批次補齊核心：plans = {引擎: [日期...]}
+    所有指數需要的日期取聯集，快取未命中的日期只抓一次 (限速 + 併發)，
+    再依日期順序分送給每個需要該日的指數計算並寫入
+    輸出: {引擎: 成功寫入筆數}
+    """
+    needed = {}       # 日期 -> 需要該日的引擎
+    to_fetch = set()  # 至少一個指數快取未命中、需要連線的日期
+    for engine, dates in plans.items():
+        config = engine._load_config()
+        for d in dates:
+            needed.setdefault(d, []).append(engine)
+            if not nav_cache.has(d, list(engine._active_basket(config, d)[0])):
+                to_fetch.add(d)
+    all_dates = sorted(needed)
+    fetching = scraper.fetch_many([d for d in all_dates if d in to_fetch])
+    success = {engine: 0 for engine in plans}
+
+    for i, d_str in enumerate(all_dates):
+        if progress_callback:
+            progress_callback(i / len(all_dates), f"正在補齊: {d_str}")
+
+        navs = next(fetching)[1] if d_str in to_fetch else _UNSET
+        for engine in needed[d_str]:
+            with span("batch.day", date=d_str, index=engine.index_id, cache="hit" if navs is _UNSET else "miss") as sp:
+                idx, _ = engine._calculate(d_str, commit=False, fetched=navs)
+                sp.set(ok=idx is not None)
+            if idx:
+                success[engine] += 1
+
+    for engine in plans:
+        engine.history.flush()
+    nav_cache.save()
+    calendar.save()
+    scraper.flush()
+    tracer.write_summary()
+    return success
 
 class IndexEngine:
-    def __init__(self):
-        self.scraper = SitcaScraper()
+    """
+    單一指數的計算引擎
+    index: registry 內的指數定義 (設定檔/歷史檔路徑)，未給則為預設的 TSF-Top5
+    scraper / nav_cache / calendar 可由 MultiIndexEngine 傳入共用，多個指數只抓一次
+    """
+    def __init__(self, index=None, scraper=None, nav_cache=None, calendar=None):
+        self.index = index or default_index()
+        self.index_id = self.index["id"]
+        self.config_file = self.index["config"]
+        self.snapshot_file = self.index["snapshot"]
+        self.scraper = scraper or SitcaScraper(target_funds=fund_keywords([self.index]), archive=new_archive(), raw_archive=new_raw_archive())
+        self.nav_cache = nav_cache or NavCache()
+        self.calendar = calendar or TradingCalendar()
+        self.history = HistoryStore(self.index["history"])
+        self.metrics = MetricsState(self.index["metrics"])
+        self._last_cache = None # 最近一次計算的快取結果 (效能記錄用)
         # 確保 data 資料夾存在
-        os.makedirs(os.path.dirname(INDEX_CONFIG_FILE), exist_ok=True)
+        os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+
+    def initialize_index(self, base_date, funds=None, weights=None):
+        """
+        初始建倉：計算並儲存權重
+        funds: {'基金名稱': [關鍵字...]}，未給則沿用設定檔內的 funds 或 config.TARGET_FUNDS
+        weights: {'基金名稱': 0.3, ...}，合計須為 100%，未給則沿用設定檔內的 weights，都沒有為等權重
+        """
+        saved = self._load_config() if os.path.exists(self.config_file) else {}
+        if funds:
+            self.scraper.add_funds(funds)
+        else:
+            funds = saved.get("funds")
+        weights = weights or saved.get("weights")
+        names = list(weights or funds or TARGET_FUNDS)
+        if weights and abs(sum(weights.values()) - 1) > 1e-6:
+            return False, "❌ 權重合計必須為 100%"
 
-    def initialize_index(self, base_date):
-        """ 初始建倉：計算並儲存權重 """
         navs = self.scraper.fetch_data(base_date)
-        if not navs or len(navs) < 5:
-            return False, "❌ 無法取得完整 5 檔成分股淨值 (可能是假日或資料源缺漏)。"
+        if not navs or any(n not in navs for n in names):
+            return False, f"❌ 無法取得完整 {len(names)} 檔成分股淨值 (可能是假日或資料源缺漏)。"
 
         initial_capital = 1_000_000
-        allocation = initial_capital / 5
         
         config = {
             "base_date": base_date,
             "base_market_cap": initial_capital,
             "constituents": {}
         }
+        if funds:
+            config["funds"] = funds
+        if weights:
+            config["weights"] = weights
 
-        for name, nav in navs.items():
+        for name in names:
+            nav = navs[name]
+            allocation = initial_capital * weights[name] if weights else initial_capital / len(names)
             units = allocation / nav
             config["constituents"][name] = {
                 "base_nav": nav,
                 "units": units
             }
+        self.nav_cache.put(base_date, navs)
 
-        # 寫入設定檔 (強制 UTF-8)
-        with open(INDEX_CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
+        self._save_config(config)
             
         # 清空並寫入第一筆歷史
-        df = pd.DataFrame([{"date": base_date, "index_value": 100.00}])
-        df.to_csv(HISTORY_FILE, index=False)
+        self.history.reset([(base_date, 100.00)])
         return True, "✅ 指數設定檔已建立，基期設為 100.00"
 
     def calculate_index(self, target_date):
         """ 計算單日指數 (回傳: 指數值, 明細) """
-        if not os.path.exists(INDEX_CONFIG_FILE):
+        with span("engine.calculate_index", date=str(target_date)) as sp:
+            index_value, details = self._calculate(target_date, commit=True)
+            sp.set(ok=index_value is not None, cache=self._last_cache)
+        return index_value, details
+
+    def get_latest_details(self):
+        """ 只讀本地快取取得最新成分股明細 (不連線、不寫檔)，回傳 (日期, 明細) """
+        if not os.path.exists(self.config_file):
+            return None, []
+
+        config = self._load_config()
+        names = list(self._active_basket(config, "99991231")[0]) # 最新一期的成分股
+        latest = self.nav_cache.latest_date(names)
+        if not latest:
+            return None, []
+        _, details = self._compute(config, self.nav_cache.get(latest, names), latest)
+        return latest, details
+
+    def build_snapshot(self):
+        """ 產生前端看板快照 (只用歷史檔與本地淨值快取，不連線；指標走增量狀態) """
+        nav_date, details = self.get_latest_details()
+        rows = self.history.rows()
+        kpis = self.metrics.sync(rows)
+        return build_snapshot(rows, details, kpis, self.metrics.bars, self.contribution_points([d for d, _ in rows]), nav_date)
+
+    def contribution_points(self, dates):
+        """
+        每檔成分股每天對指數點數的貢獻 (units × 淨值變動 / 除數 × 100，用前一天適用的籃子)
+        再平衡日的指數以新籃子計價、但除數讓它等於舊籃子當天的價值，所以當天的變動仍屬於舊籃子；
+        各檔貢獻加總等於指數變動。快取缺淨值的日子記為 None (無從拆解)，不在籃子內的基金記為 0
+        輸出: {'names': [...], 'points': [[每日貢獻...] (每檔一列)]}
+        """
+        if not os.path.exists(self.config_file):
+            return {"names": [], "points": []}
+        config = self._load_config()
+        names = list(config["constituents"])
+        for rb in config.get("rebalances", []):
+            names += [n for n in rb["constituents"] if n not in names]
+        points = {n: [0.0] * len(dates) for n in names}
+        navs = self.nav_cache.as_dict()
+        for t in range(1, len(dates)):
+            cur, prev = navs.get(dates[t], {}), navs.get(dates[t - 1], {})
+            constituents, divisor = self._active_basket(config, dates[t - 1])
+            if not all(name in cur and name in prev for name in constituents):
+                for name in names:
+                    points[name][t] = None
+                continue
+            for name, data in constituents.items():
+                points[name][t] = data["units"] * (cur[name] - prev[name]) / divisor * 100
+        return {"names": names, "points": [points[n] for n in names]}
+
+    def add_rebalance(self, rebalance_date, weights):
+        """
+        【再平衡】換成分股但不重置基期：weights = {'基金名稱': 0.2, ...}，合計須為 100%
+        新成分股須先在 config.TARGET_FUNDS 或設定檔的 funds 設定關鍵字；再平衡日淨值不在快取時才連線抓一次
+        """
+        if abs(sum(weights.values()) - 1) > 1e-6:
+            return False, "❌ 權重合計必須為 100%"
+
+        config = self._load_config()
+        rebalance_date = str(rebalance_date)
+        old_names = list(self._active_basket(config, rebalance_date)[0])
+        names = list(dict.fromkeys(old_names + list(weights)))
+        if not self.nav_cache.has(rebalance_date, names):
+            navs = self.scraper.fetch_data(rebalance_date)
+            if navs:
+                self.nav_cache.put(rebalance_date, navs)
+
+        rebalances = [rb for rb in config.get("rebalances", []) if str(rb["date"]) != rebalance_date]
+        rebalances.append({"date": rebalance_date, "constituents": {n: {"weight": w} for n, w in weights.items()}})
+        config["rebalances"] = sorted(rebalances, key=lambda rb: str(rb["date"]))
+        return self.recompute_history(config)
+
+    def recompute_history(self, config=None):
+        """
+        【向量化重算】由 日期 × 基金 淨值矩陣一次重算整段指數 (使用本地淨值快取，不連線)
+        再平衡解析出的 units / divisor 會寫回設定檔，供每日計算沿用
+        """
+        from .vector_index import build_nav_matrix, compute_index_series # numpy 只在重算時載入
+
+        if config is None:
+            if not os.path.exists(self.config_file):
+                return False, "⚠️ 請先執行初始化"
+            config = self._load_config()
+
+        funds = list(config["constituents"])
+        for rb in config.get("rebalances", []):
+            funds += [n for n in rb["constituents"] if n not in funds]
+        dates, navs = build_nav_matrix(self.nav_cache.as_dict(), funds)
+        try:
+            values, resolved = compute_index_series(dates, funds, navs, config)
+        except ValueError as e:
+            return False, f"❌ {e}"
+
+        config["rebalances"] = resolved
+        if not resolved:
+            config.pop("rebalances")
+        self._save_config(config)
+
+        # 快取沒有淨值的舊日期保留原值 (無從重算)，其餘以重算結果取代
+        rows = dict(self.history.rows())
+        recomputed = {d: float(v) for d, v in zip(dates, values) if v == v} # v == v 排除 NaN
+        kept = len(set(rows) - set(recomputed))
+        rows.update(recomputed)
+        self.history.reset(sorted(rows.items()))
+        return True, f"✅ 已重算 {len(recomputed)} 筆指數 ({len(resolved)} 次再平衡)，{kept} 筆因快取無淨值保留原值。"
+
+    def _calculate(self, target_date, commit, fetched=_UNSET):
+        """
+        commit=False 時淨值快取只留在記憶體，由呼叫端 (批次) 最後統一存檔
+        fetched: 批次模式預先抓好的淨值，快取未命中時直接使用，不再連線
+        """
+        if not os.path.exists(self.config_file):
             return None, "⚠️ 請先執行初始化"
 
-        with open(INDEX_CONFIG_FILE, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = self._load_config()
+
+        # 先查本地淨值快取，命中時完全不需連線公會
+        current_navs = self.nav_cache.get(target_date, list(self._active_basket(config, target_date)[0]))
+        self._last_cache = "hit" if current_navs is not None else "miss"
+        if current_navs is None:
+            if fetched is _UNSET:
+                # 已知休市日 (週末/假日/曾查無資料) 直接略過，不連線
+                if not self.calendar.is_trading_day(target_date):
+                    return None, "No Data"
+                fetched = self.scraper.fetch_data(target_date)
+            current_navs = fetched
+            if current_navs == {}:
+                self.calendar.mark_closed(target_date, save=commit) # 頁面沒有淨值表格：記入負向快取
+            if not current_navs:
+                return None, "No Data" 
+            self.nav_cache.put(target_date, current_navs, save=commit)
+            if commit:
+                self.scraper.flush()
 
-        # 檢查歷史檔 (簡單快取)
-        if os.path.exists(HISTORY_FILE):
-            df_hist = pd.read_csv(HISTORY_FILE)
-            if str(target_date) in df_hist['date'].astype(str).values:
-                # 若已存在，還是算一次以取得成分股明細 (可優化，但目前保留以確保資料一致)
-                pass 
+        index_value, details = self._compute(config, current_navs, target_date)
+        if index_value is None:
+            return None, details
 
-        current_navs = self.scraper.fetch_data(target_date)
-        if not current_navs:
-            return None, "No Data" 
+        self._append_history(target_date, index_value, commit=commit)
+        return index_value, details
 
+    def _compute(self, config, current_navs, target_date):
+        """ 純計算：由成分股淨值算出指數與明細 (不做任何 I/O) """
+        constituents, divisor = self._active_basket(config, target_date)
+        base_caps = {name: data["units"] * data["base_nav"] for name, data in constituents.items()}
         current_market_cap = 0.0
         details = []
 
-        for name, data in config["constituents"].items():
+        for name, data in constituents.items():
             if name in current_navs:
                 nav = current_navs[name]
                 mkt_val = data["units"] * nav
@@ -75,90 +296,84 @@ class IndexEngine:
                     "基金名稱": name, 
                     "最新淨值": nav, 
                     "市值貢獻": mkt_val,
-                    "權重": "20%" 
+                    "權重": f"{base_caps[name] / sum(base_caps.values()):.0%}"
                 })
             else:
                 return None, f"缺值: {name}"
 
-        index_value = (current_market_cap / config["base_market_cap"]) * 100
-        self._append_history(target_date, index_value)
-        
+        index_value = (current_market_cap / divisor) * 100
         return index_value, details
 
+    @staticmethod
+    def _active_basket(config, target_date):
+        """ 回傳目標日期適用的 (成分股設定, 除數)；再平衡日當天起改用新籃子 """
+        constituents, divisor = config["constituents"], config["base_market_cap"]
+        for rb in sorted(config.get("rebalances", []), key=lambda r: str(r["date"])):
+            if str(target_date) >= str(rb["date"]) and "divisor" in rb:
+                constituents, divisor = rb["constituents"], rb["divisor"]
+        return constituents, divisor
+
+    def _load_config(self):
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_config(self, config):
+        # 寫入設定檔 (強制 UTF-8，暫存檔 + rename)
+        atomic_write_json(self.config_file, config, indent=4, ensure_ascii=False)
+
     def run_batch_update(self, end_date_str, progress_callback=None):
         """ 
         【智慧補齊功能】自動從「最後一次更新的日期」開始算，而不是從頭算
         """
-        if not os.path.exists(INDEX_CONFIG_FILE):
-            return "請先初始化"
+        start_date, end_date, msg = self._batch_range(end_date_str)
+        if msg:
+            return msg
+
+        success = run_fan_out({self: self.calendar.trading_days(start_date, end_date)},
+                              self.scraper, self.nav_cache, self.calendar, progress_callback)
+        cache = self.nav_cache.stats()
+        return f"批次處理完成！範圍 [{start_date.strftime('%Y%m%d')} -> {end_date.strftime('%Y%m%d')}]，成功寫入 {success[self]} 筆 (快取命中 {cache['hits']} / 未命中 {cache['misses']})。"
+
+    def _batch_range(self, end_date_str):
+        """ 決定補齊區間，回傳 (開始日, 結束日, 錯誤或「已是最新」訊息) """
+        if not os.path.exists(self.config_file):
+            return None, None, "請先初始化"
 
         # 1. 決定「開始日期」 (Start Date Logic)
         start_date = None
         
         # 嘗試從歷史紀錄找最後一天
-        if os.path.exists(HISTORY_FILE):
-            try:
-                df = pd.read_csv(HISTORY_FILE)
-                if not df.empty:
-                    df['date'] = df['date'].astype(str)
-                    last_date_str = df['date'].max() # 找出最大日期
-                    last_dt = datetime.strptime(last_date_str, "%Y%m%d")
-                    # 設定開始日為：最後紀錄的「下一天」
-                    start_date = last_dt + timedelta(days=1)
-            except Exception:
-                pass # 若讀取失敗，就回退到使用基期
+        try:
+            last_date_str = self.history.last_date() # 日期索引已排序，直接取最後一筆
+            if last_date_str:
+                last_dt = datetime.strptime(last_date_str, "%Y%m%d")
+                # 設定開始日為：最後紀錄的「下一天」
+                start_date = last_dt + timedelta(days=1)
+        except Exception:
+            pass # 若讀取失敗，就回退到使用基期
         
         # 若無歷史紀錄，則從設定檔的基期開始
         if not start_date:
-            with open(INDEX_CONFIG_FILE, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                start_date = datetime.strptime(config['base_date'], "%Y%m%d")
+            start_date = datetime.strptime(self._load_config()['base_date'], "%Y%m%d")
 
         # 2. 決定「結束日期」
         try:
             end_date = datetime.strptime(str(end_date_str), "%Y%m%d")
         except ValueError:
-             return "❌ 日期格式錯誤，請使用 YYYYMMDD"
+             return None, None, "❌ 日期格式錯誤，請使用 YYYYMMDD"
 
         # 3. 檢查是否需要更新
         if start_date > end_date:
             last_upd = start_date - timedelta(days=1)
-            return f"✅ 資料已是最新！(最後更新日: {last_upd.strftime('%Y%m%d')})"
+            return None, None, f"✅ 資料已是最新！(最後更新日: {last_upd.strftime('%Y%m%d')})"
+        return start_date, end_date, None
 
-        # 4. 產生日期列表
-        date_list = pd.date_range(start=start_date, end=end_date).tolist()
-        total_days = len(date_list)
-        success_count = 0
-        
-        # 5. 開始迴圈
-        for i, dt in enumerate(date_list):
-            d_str = dt.strftime("%Y%m%d")
-            
-            if progress_callback:
-                progress_callback(i / total_days, f"正在補齊: {d_str}")
-
-            idx, _ = self.calculate_index(d_str)
-            
-            if idx:
-                success_count += 1
-            
-            time.sleep(0.3) # 禮貌性延遲
-
-        return f"批次處理完成！範圍 [{start_date.strftime('%Y%m%d')} -> {end_date.strftime('%Y%m%d')}]，成功寫入 {success_count} 筆。"
-
-    def _append_history(self, date, value):
-        """ 將計算結果存入 CSV """
-        new_row = pd.DataFrame([{"date": date, "index_value": value}])
-        
-        if not os.path.exists(HISTORY_FILE):
-            new_row.to_csv(HISTORY_FILE, index=False)
-        else:
-            df = pd.read_csv(HISTORY_FILE)
-            df['date'] = df['date'].astype(str)
-            if str(date) not in df['date'].values:
-                new_row.to_csv(HISTORY_FILE, mode='a', header=False, index=False)
+    def _append_history(self, date, value, commit=True):
+        """ 將計算結果存入歷史 (日期重複則略過；commit=False 時由批次統一寫檔) """
+        with span("history.append", date=str(date)) as sp:
+            added = self.history.append(date, value, commit=commit)
+            sp.set(added=added, rows=len(self.history))
 
     def get_history(self):
-        if os.path.exists(HISTORY_FILE):
-            return pd.read_csv(HISTORY_FILE).sort_values('date')
-        return pd.DataFrame()
\ No newline at end of file
+        df = self.history.to_dataframe()
+        return df.sort_values('date') if not df.empty else df
@@ -0,0 +1,129 @@
+import csv
+from bisect import bisect_left, bisect_right
+from .config import HISTORY_FILE, HISTORY_FLUSH_EVERY
+from .storage import mtime, atomic_write
+from .tracing import span
+
+class HistoryStore:
+    """
+    指數歷史存取 (只用標準函式庫)
+    - 檔案只讀一次，建立記憶體內的日期索引：查重 O(1)、區間查詢用二分搜尋
+    - 新資料先進緩衝區，批次寫入；寫入時先寫暫存檔再 rename，中斷也不會弄壞 CSV
+    - 檔案格式維持 date,index_value 的 CSV，GitHub 網頁手動修改與排程流程都不受影響
+    - 改寫時未變動的列原樣寫回 (含原本的換行字元)，新列沿用檔案最後一列的換行，git diff 只會出現真的改過的列
+    """
+    def __init__(self, path=HISTORY_FILE, flush_every=HISTORY_FLUSH_EVERY):
+        self.path = path
+        self.flush_every = flush_every
+        self._dates = []      # 已排序的日期字串
+        self._values = {}     # 日期 -> 指數值
+        self._pending = []    # 尚未落地的 (日期, 指數值)
+        self._raw = {}        # 日期 -> 檔案中的原始一列 (含換行)；"" 為標題列
+        self._newline = '\n'  # 新列使用的換行字元
+        self._mtime = None
+
+    def __contains__(self, date):
+        self._ensure_loaded()
+        return str(date) in self._values
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._dates)
+
+    def get(self, date):
+        self._ensure_loaded()
+        return self._values.get(str(date))
+
+    def last_date(self):
+        self._ensure_loaded()
+        return self._dates[-1] if self._dates else None
+
+    def append(self, date, value, commit=True):
+        """ 新增一筆 (日期已存在則略過並回傳 False)；commit=False 時累積到 flush_every 筆才寫檔 """
+        self._ensure_loaded()
+        date = str(date)
+        if date in self._values:
+            return False
+        self._values[date] = float(value)
+        if not self._dates or date > self._dates[-1]:
+            self._dates.append(date)
+        else:
+            self._dates.insert(bisect_left(self._dates, date), date)
+        self._pending.append((date, float(value)))
+        if commit or len(self._pending) >= self.flush_every:
+            self.flush()
+        return True
+
+    def flush(self):
+        """ 將緩衝區寫入檔案 (暫存檔 + rename，原子替換) """
+        if not self._pending:
+            return
+        with span("history.flush", rows=len(self._dates), pending=len(self._pending)):
+            self._write(self.path)
+        self._pending = []
+        self._mtime = mtime(self.path)
+
+    def reset(self, rows):
+        """ 以新的 [(日期, 指數值), ...] 整個取代歷史 (初始化/重算用) """
+        self._values = {str(d): float(v) for d, v in rows}
+        self._dates = sorted(self._values)
+        self._pending = list(rows)
+        self.flush()
+
+    def range(self, start=None, end=None):
+        """ 回傳 [start, end] 區間內的 [(日期, 指數值), ...] (含頭尾，None 代表不設限) """
+        self._ensure_loaded()
+        lo = bisect_left(self._dates, str(start)) if start else 0
+        hi = bisect_right(self._dates, str(end)) if end else len(self._dates)
+        return [(d, self._values[d]) for d in self._dates[lo:hi]]
+
+    def rows(self):
+        return self.range()
+
+    def export_csv(self, path):
+        """ 匯出成 CSV (與 tsf_history.csv 相同格式) """
+        self._ensure_loaded()
+        self._write(path)
+
+    def to_dataframe(self):
+        """ 分析/畫圖用，才載入 pandas """
+        import pandas as pd
+        return pd.DataFrame(self.rows(), columns=["date", "index_value"])
+
+    def _ensure_loaded(self):
+        """ 首次使用或檔案被外部修改 (且沒有未寫入的資料) 時才重新讀檔 """
+        current = mtime(self.path)
+        if self._mtime is not None and (current == self._mtime or self._pending):
+            return
+        self._values, self._raw = {}, {}
+        if current is not None:
+            with open(self.path, 'r', encoding='utf-8', newline='') as f:
+                lines = f.read().splitlines(keepends=True)
+            if lines:
+                self._raw[""] = lines[0]
+                self._newline = '\r\n' if lines[-1].endswith('\r\n') else '\n'
+            for line, row in zip(lines[1:], csv.DictReader(lines)):
+                try:
+                    date = str(row['date']).strip()
+                    self._values[date] = float(row['index_value'])
+                    self._raw[date] = line
+                except (KeyError, TypeError, ValueError):
+                    print(f"History Warning: 略過無法解析的列 {row}")
+        self._dates = sorted(self._values)
+        self._mtime = current if current is not None else 0
+
+    def _write(self, path):
+        lines = [self._line("", "date,index_value")]
+        for d in self._dates:
+            lines.append(self._line(d, f"{d},{self._values[d]!r}"))
+        atomic_write(path, lambda f: f.writelines(lines), encoding='utf-8', newline='')
+
+    def _line(self, date, text):
+        """ 值沒變的列沿用原始文字與換行，其餘 (新增/改值) 用檔案的換行字元 """
+        raw = self._raw.get(date)
+        if raw is not None and (date == "" or float(raw.split(',', 1)[1]) == self._values[date]):
+            line = raw if raw.endswith('\n') else raw + self._newline # 原本的最後一列可能沒有換行
+        else:
+            line = text + self._newline
+        self._raw[date] = line
+        return line
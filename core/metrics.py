@@ -0,0 +1,134 @@
+import json
+import math
+import os
+import zlib
+from .config import METRICS_STATE_FILE
+from .series import PERIODS, period_key, ohlc_push
+from .storage import mtime, changed, atomic_write_json
+
+METRICS_VERSION = 2 # 2: 加入週 / 月 K 棒
+
+def _row_checksum(date, value):
+    return zlib.crc32(f"{date},{float(value)!r}".encode('utf-8'))
+
+class MetricsState:
+    """
+    看板指標的增量狀態：每新增一天只做 O(1) 更新
+    - 歷史高點 / 最大回撤 (running peak / MDD)
+    - 日報酬的 Welford 平均數與變異數 (算 Sharpe)
+    - 走勢圖用的週 / 月 OHLC 聚合 (只更新最後一根)
+    每一列都存 checksum 與當時的狀態；歷史檔被手動修改時，從第一個不一致的日期往後重算即可
+    """
+    def __init__(self, path=METRICS_STATE_FILE):
+        self.path = path
+        self.rows = None  # [[日期, checksum, peak, mdd, n, mean, m2], ...]
+        self.bars = None  # {'weekly': [[期別, 開, 高, 低, 收], ...], 'monthly': [...]}
+        self.recomputed = 0 # 最近一次 sync 重算的列數 (除錯用)
+        self._dirty = False
+        self._mtime = None
+
+    def sync(self, history_rows):
+        """ 與歷史 [(日期, 指數值), ...] 對齊：找出第一個 checksum 不符的列，只重算該列之後 """
+        self._load()
+        start = 0
+        limit = min(len(self.rows), len(history_rows))
+        while start < limit and self.rows[start][0] == history_rows[start][0] \
+                and self.rows[start][1] == _row_checksum(*history_rows[start]):
+            start += 1
+
+        if start < len(self.rows) or start < len(history_rows):
+            del self.rows[start:]
+            bar_starts = self._rewind_bars(history_rows, start)
+            for i in range(min([start, *bar_starts.values()]), len(history_rows)):
+                if i >= start:
+                    prev_value = history_rows[i - 1][1] if i > 0 else None
+                    self._push(history_rows[i], prev_value)
+                for period, bar_start in bar_starts.items():
+                    if i >= bar_start:
+                        ohlc_push(self.bars[period], history_rows[i][0], float(history_rows[i][1]), period)
+            self._dirty = True
+        self.recomputed = len(history_rows) - start
+        return self.kpis(history_rows)
+
+    def kpis(self, history_rows):
+        """ 由目前狀態組出看板數字 (格式同 snapshot.compute_kpis) """
+        if not history_rows or not self.rows:
+            return {"latest": 100.0, "delta": 0.0, "ytd": 0.0, "mdd": 0.0, "sharpe": 0.0}
+        latest = history_rows[-1][1]
+        first = history_rows[0][1]
+        _, _, _, mdd, n, mean, m2 = self.rows[-1]
+        sharpe = 0.0
+        if n >= 2:
+            std = math.sqrt(m2 / (n - 1)) # 樣本標準差 (ddof=1)
+            if std != 0:
+                sharpe = mean / std * (252 ** 0.5)
+        return {
+            "latest": latest,
+            "delta": latest - history_rows[-2][1] if len(history_rows) >= 2 else 0.0,
+            "ytd": (latest - first) / first * 100,
+            "mdd": mdd * 100,
+            "sharpe": sharpe,
+        }
+
+    def save(self):
+        if not self._dirty:
+            return
+        atomic_write_json(self.path, {"version": METRICS_VERSION, "rows": self.rows, "bars": self.bars}, separators=(',', ':'))
+        self._mtime = mtime(self.path)
+        self._dirty = False
+
+    def refresh(self):
+        """ 狀態檔被其他行程改過 (且沒有未寫入的狀態) 時，下次使用重新讀檔 """
+        if self.rows is not None and not self._dirty and changed(self.path, self._mtime):
+            self.rows = None
+
+    def _push(self, row, prev_value):
+        """ O(1) 更新：以前一列狀態推進一天 """
+        date, value = row[0], float(row[1])
+        if self.rows:
+            _, _, peak, mdd, n, mean, m2 = self.rows[-1]
+        else:
+            peak, mdd, n, mean, m2 = value, 0.0, 0, 0.0, 0.0
+        peak = max(peak, value)
+        mdd = min(mdd, (value - peak) / peak)
+        if prev_value is not None:
+            ret = value / prev_value - 1
+            n += 1
+            delta = ret - mean
+            mean += delta / n
+            m2 += delta * (ret - mean)
+        self.rows.append([date, _row_checksum(date, value), peak, mdd, n, mean, m2])
+
+    def _rewind_bars(self, history_rows, start):
+        """
+        K 棒只保留完全落在未變動區段內的期別：最後一根可能跨過 start，連同之後的都刪掉，
+        回傳 {期別種類: 需要重新併入 K 棒的第一列 (該期的第一天)}
+        """
+        if start == 0:
+            self.bars = {period: [] for period in PERIODS}
+            return {period: 0 for period in PERIODS}
+        bar_starts = {}
+        for period in PERIODS:
+            key = period_key(history_rows[start - 1][0], period)
+            while self.bars[period] and self.bars[period][-1][0] >= key:
+                self.bars[period].pop()
+            i = start - 1
+            while i > 0 and period_key(history_rows[i - 1][0], period) == key:
+                i -= 1
+            bar_starts[period] = i
+        return bar_starts
+
+    def _load(self):
+        if self.rows is not None:
+            return
+        self.rows = []
+        self.bars = {period: [] for period in PERIODS}
+        self._mtime = mtime(self.path)
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == METRICS_VERSION:
+                    self.rows, self.bars = data["rows"], data["bars"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Metrics Error: {e}") # 狀態壞掉就整段重算
@@ -0,0 +1,60 @@
+from .engine import IndexEngine, run_fan_out, new_archive, new_raw_archive
+from .scraper import SitcaScraper
+from .nav_cache import NavCache
+from .trading_calendar import TradingCalendar
+from .registry import load_registry, fund_keywords
+
+class MultiIndexEngine:
+    """
+    多指數：所有指數共用一個爬蟲、淨值快取與交易日曆
+    每個日期只向公會查詢、解析一次 (擷取所有指數成分股的聯集)，再分送給各指數計算
+    新增指數只多一些記憶體內的運算，不會多任何一次連線
+    """
+    def __init__(self, indices=None):
+        indices = indices or load_registry()
+        self.scraper = SitcaScraper(target_funds=fund_keywords(indices), archive=new_archive(), raw_archive=new_raw_archive())
+        self.nav_cache = NavCache()
+        self.calendar = TradingCalendar()
+        self.engines = {
+            index["id"]: IndexEngine(index, self.scraper, self.nav_cache, self.calendar) for index in indices
+        }
+
+    def __getitem__(self, index_id):
+        return self.engines[index_id]
+
+    def __iter__(self):
+        return iter(self.engines.values())
+
+    def refresh(self):
+        """
+        寫入端取得寫入鎖後呼叫：其他行程 (每日排程 / 網頁後台) 改過的檔案重新讀取，
+        避免長駐的寫入端拿舊內容整檔覆寫、蓋掉別人的資料 (歷史檔本身每次使用都會檢查)
+        """
+        self.nav_cache.refresh()
+        self.calendar.refresh()
+        self.scraper.refresh()
+        for engine in self:
+            engine.metrics.refresh()
+
+    def calculate_index(self, target_date):
+        """
+        計算所有指數的單日點位 (回傳: {指數 id: (指數值, 明細)})
+        第一個需要連線的指數抓取後寫入共用快取，其餘指數直接命中快取
+        """
+        return {index_id: engine.calculate_index(target_date) for index_id, engine in self.engines.items()}
+
+    def run_batch_update(self, end_date_str, progress_callback=None):
+        """ 所有指數一起補齊：各自決定開始日，需要的日期取聯集後每天只抓一次 """
+        plans, notes = {}, []
+        for engine in self.engines.values():
+            start_date, end_date, msg = engine._batch_range(end_date_str)
+            if msg:
+                notes.append(f"[{engine.index['name']}] {msg}")
+                continue
+            plans[engine] = self.calendar.trading_days(start_date, end_date)
+
+        if plans:
+            success = run_fan_out(plans, self.scraper, self.nav_cache, self.calendar, progress_callback)
+            notes += [f"[{engine.index['name']}] 成功寫入 {n} 筆" for engine, n in success.items()]
+        cache = self.nav_cache.stats()
+        return f"批次處理完成！{'；'.join(notes)} (快取命中 {cache['hits']} / 未命中 {cache['misses']})。"
@@ -0,0 +1,84 @@
+import json
+import os
+from .config import NAV_CACHE_FILE
+from .storage import mtime, changed, atomic_write_json
+
+class NavCache:
+    """ 本地淨值快取：以 (日期, 基金) 為鍵，命中時完全不需連線公會 """
+    def __init__(self, path=NAV_CACHE_FILE):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data = None
+        self._dirty = False
+        self._mtime = None
+
+    def _load(self):
+        """ 延遲載入：整個檔案只讀一次 """
+        if self._data is None:
+            self._data = {}
+            self._mtime = mtime(self.path)
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"NavCache Error: {e}") # 快取壞掉就當作空的，不影響主流程
+        return self._data
+
+    def get(self, date_str, names):
+        """
+        輸入: "20260127", ['統一奔騰', ...]
+        輸出: Dict {'統一奔騰': 120.5, ...} (須全部成分股都有值才算命中) 或 None
+        """
+        entry = self._load().get(str(date_str))
+        if entry and all(n in entry for n in names):
+            self.hits += 1
+            return {n: entry[n] for n in names}
+        self.misses += 1
+        return None
+
+    def has(self, date_str, names):
+        """ 只檢查是否命中，不計入 hit/miss 統計 """
+        entry = self._load().get(str(date_str))
+        return bool(entry) and all(n in entry for n in names)
+
+    def put(self, date_str, navs, save=True, replace=False):
+        """ 寫入單日淨值 (批次模式可傳 save=False，最後再統一 save；replace=True 整天取代而非合併) """
+        if not navs:
+            return
+        if replace:
+            self._load()[str(date_str)] = dict(navs)
+        else:
+            self._load().setdefault(str(date_str), {}).update(navs)
+        self._dirty = True
+        if save:
+            self.save()
+
+    def save(self):
+        """ 先寫暫存檔再 rename，避免寫到一半中斷造成檔案損毀 """
+        if not self._dirty:
+            return
+        atomic_write_json(self.path, self._data, indent=1, ensure_ascii=False, sort_keys=True)
+        self._mtime = mtime(self.path)
+        self._dirty = False
+
+    def refresh(self):
+        """ 檔案被其他行程改過 (且沒有未寫入的資料) 時，下次使用重新讀檔；寫入端取得寫入鎖後呼叫 """
+        if self._data is not None and not self._dirty and changed(self.path, self._mtime):
+            self._data = None
+
+    def latest_date(self, names):
+        """ 回傳成分股淨值齊全的最新日期 (無則 None) """
+        data = self._load()
+        for d in sorted(data, reverse=True):
+            if all(n in data[d] for n in names):
+                return d
+        return None
+
+    def as_dict(self):
+        """ 全部快取內容 {日期: {基金: 淨值}} (唯讀使用，供向量化重算) """
+        return self._load()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
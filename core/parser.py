@@ -0,0 +1,138 @@
+import re
+from html import unescape
+from .config import TARGET_FUNDS
+
+# 預先編譯的正規表示式 (整個模組共用，不必每次解析都重新建立)
+_INPUT_RE = re.compile(r'<input\b[^>]*>', re.I)
+_ATTR_RE = re.compile(r'''([\w:$.\-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''')
+_TABLE_OPEN_RE = re.compile(r'<table\b', re.I)
+_TABLE_CLOSE_RE = re.compile(r'</table\s*>', re.I)
+_ROW_RE = re.compile(r'<tr\b[^>]*>(.*?)</tr\s*>', re.I | re.S)
+_CELL_RE = re.compile(r'<td\b[^>]*>(.*?)</td\s*>', re.I | re.S)
+_HEADER_CELL_RE = re.compile(r'<t[hd]\b[^>]*>(.*?)</t[hd]\s*>', re.I | re.S)
+_TAG_RE = re.compile(r'<[^>]+>')
+_SELECT_RE = re.compile(r'<select\b[^>]*\bname\s*=\s*["\']([^"\']+)["\'][^>]*>(.*?)</select\s*>', re.I | re.S)
+_OPTION_RE = re.compile(r'<option\b([^>]*)>(.*?)</option\s*>', re.I | re.S)
+
+def parse_hidden_inputs(html):
+    """ 擷取所有具 name 的 <input> 欄位 (含 __VIEWSTATE 等 ASP.NET 隱藏欄位) """
+    payload = {}
+    for tag in _INPUT_RE.findall(html):
+        attrs = {}
+        for m in _ATTR_RE.finditer(tag[6:]):
+            value = m.group(2) if m.group(2) is not None else m.group(3) if m.group(3) is not None else m.group(4)
+            attrs[m.group(1).lower()] = unescape(value)
+        if attrs.get('name'):
+            payload[attrs['name']] = attrs.get('value', '')
+    return payload
+
+def parse_select_options(html, name):
+    """ 擷取指定 <select> 的所有選項 {value: 顯示文字} (例如投信公司下拉選單)；找不到回傳空 Dict """
+    for select_name, body in _SELECT_RE.findall(html):
+        if unescape(select_name) != name:
+            continue
+        options = {}
+        for attrs, label in _OPTION_RE.findall(body):
+            m = re.search(r'''value\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', attrs, re.I)
+            value = unescape(next(g for g in m.groups() if g is not None)) if m else _cell_text(label)
+            options[value] = _cell_text(label)
+        return options
+    return {}
+
+def _cell_text(cell_html):
+    return unescape(_TAG_RE.sub('', cell_html)).strip()
+
+class NavTableParser:
+    """
+    公會淨值頁的專用解析器：直接定位淨值表格，只對命中關鍵字的列拆欄位
+    規則與原本相同：主關鍵字必須出現、次要關鍵字至少出現一個，淨值取 "TWD" 右邊那一欄
+    """
+    def __init__(self, target_funds=TARGET_FUNDS):
+        self.target_funds = target_funds
+        # 所有主關鍵字合併成一個 matcher，每列只需掃描一次
+        primaries = sorted({kw[0] for kw in target_funds.values()}, key=len, reverse=True)
+        self.matcher = re.compile('|'.join(re.escape(k) for k in primaries)) if primaries else None
+
+    def find_table(self, html):
+        """ 回傳包含「基金名稱」與「淨值」的最內層表格 HTML，找不到回傳 None """
+        pos = html.find("基金名稱")
+        while pos != -1:
+            start = None
+            for m in _TABLE_OPEN_RE.finditer(html, 0, pos):
+                start = m.start()
+            end_m = _TABLE_CLOSE_RE.search(html, pos)
+            if start is not None and end_m:
+                table = html[start:end_m.end()]
+                if "淨值" in table:
+                    return table
+            pos = html.find("基金名稱", pos + 1)
+        return None
+
+    def parse(self, html):
+        """
+        輸出: Dict {'統一奔騰': 120.5, ...}；頁面沒有淨值表格時回傳 None
+        """
+        table = self.find_table(html)
+        if table is None:
+            return None
+
+        results = {}
+        if self.matcher is None:
+            return results
+        for row in _ROW_RE.findall(table):
+            # 先用單一 matcher 篩掉絕大多數不相干的列
+            if not self.matcher.search(row):
+                continue
+            text = _cell_text(row)
+            col_texts = None
+            for name, keywords in self.target_funds.items():
+                if keywords[0] not in text:
+                    continue
+                # 過濾次要關鍵字 (如 "T", "累積")
+                if len(keywords) > 1 and not any(k in text for k in keywords[1:]):
+                    continue
+
+                if col_texts is None:
+                    col_texts = [_cell_text(c) for c in _CELL_RE.findall(row)]
+                nav = self._nav_after_twd(col_texts)
+                if nav is not None:
+                    results[name] = nav
+        return results
+
+    def parse_universe(self, html):
+        """
+        全市場：擷取表格內每一檔新台幣計價基金的淨值
+        輸出: Dict {'基金完整名稱': 淨值, ...}；頁面沒有淨值表格時回傳 None
+        """
+        table = self.find_table(html)
+        if table is None:
+            return None
+
+        rows = _ROW_RE.findall(table)
+        name_col = None
+        results = {}
+        for row in rows:
+            if name_col is None:
+                # 標題列：找出「基金名稱」是第幾欄
+                if "基金名稱" in row:
+                    headers = [_cell_text(c) for c in _HEADER_CELL_RE.findall(row)]
+                    name_col = next((i for i, h in enumerate(headers) if "基金名稱" in h), None)
+                continue
+            col_texts = [_cell_text(c) for c in _CELL_RE.findall(row)]
+            if len(col_texts) <= name_col or not col_texts[name_col]:
+                continue
+            nav = self._nav_after_twd(col_texts)
+            if nav is not None:
+                results[col_texts[name_col]] = nav
+        return results
+
+    @staticmethod
+    def _nav_after_twd(col_texts):
+        """ 智能定位 "TWD" 右邊那一欄 """
+        for i, val in enumerate(col_texts):
+            if val == 'TWD' and i+1 < len(col_texts):
+                try:
+                    return float(col_texts[i+1].replace(',', '')) # 去除逗號
+                except ValueError:
+                    return None
+        return None
@@ -0,0 +1,105 @@
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from .config import PUBLICATION_LOG_FILE, POLL_BASE_INTERVAL, POLL_MAX_INTERVAL, POLL_BACKOFF, POLL_JITTER
+from .storage import atomic_write_json
+from .tracing import span
+
+TAIPEI = timezone(timedelta(hours=8)) # 公會公布時間以台灣時間記錄 (GitHub 主機是 UTC)
+
+def taipei_now():
+    return datetime.now(TAIPEI)
+
+class PublicationLog:
+    """
+    每個交易日的公布時間紀錄 (data/publication_log.json)，用來調整排程時間
+    {日期: {'first_probe', 'partial_at', 'published_at', 'probes', 'missing'}}，時間皆為台灣時間 HH:MM:SS
+    """
+    def __init__(self, path=PUBLICATION_LOG_FILE):
+        self.path = path
+        self._data = None
+
+    def entry(self, date_str):
+        return self._load().setdefault(str(date_str), {
+            "first_probe": None, "partial_at": None, "published_at": None, "probes": 0, "missing": [],
+        })
+
+    def save(self):
+        if self._data is None:
+            return
+        atomic_write_json(self.path, self._data, indent=1, ensure_ascii=False, sort_keys=True)
+
+    def summary(self, last=60):
+        """ 最近 last 個有公布的交易日：公布時間的中位數、p90 與最晚 (HH:MM) """
+        times = sorted(e["published_at"] for _, e in sorted(self._load().items())[-last:] if e.get("published_at"))
+        if not times:
+            return None
+        return {
+            "days": len(times),
+            "p50": times[len(times) // 2][:5],
+            "p90": times[int(round(0.9 * (len(times) - 1)))][:5],
+            "latest": times[-1][:5],
+        }
+
+    def _load(self):
+        if self._data is None:
+            self._data = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"PublicationLog Error: {e}")
+        return self._data
+
+def backoff_delays(base=POLL_BASE_INTERVAL, cap=POLL_MAX_INTERVAL, factor=POLL_BACKOFF, jitter=POLL_JITTER):
+    """ 指數退避 + 隨機抖動的等待秒數 (無限產生)，避免每次都在同一秒打公會 """
+    delay = base
+    while True:
+        yield delay * random.uniform(1 - jitter, 1 + jitter)
+        delay = min(cap, delay * factor)
+
+def wait_for_publication(scraper, date_str, names, until, log, sleep=time.sleep, now=taipei_now):
+    """
+    輪詢直到目標日期所有成分股的淨值都已公布，或超過 until (台灣時間 datetime)
+    - 查無資料：尚未公布，退避後再查 (不記成休市日)
+    - 只有部分成分股：公布進行中，記下缺哪些，等待間隔重設為最短
+    輸出: 齊全的淨值 Dict；逾時回傳 None
+    """
+    entry = log.entry(date_str)
+    seen = {}
+    delays = backoff_delays()
+    while True:
+        probe_at = now()
+        entry["first_probe"] = entry["first_probe"] or probe_at.strftime("%H:%M:%S")
+        entry["probes"] += 1
+        with span("poll.probe", date=date_str) as sp:
+            navs = scraper.fetch_data(date_str)
+            seen.update(navs or {}) # 已公布的淨值不會再變動，累積起來
+            missing = [n for n in names if n not in seen]
+            sp.set(found=len(names) - len(missing), missing=len(missing))
+
+        if not missing:
+            entry["published_at"] = probe_at.strftime("%H:%M:%S")
+            entry["missing"] = []
+            log.save()
+            print(f"📢 {date_str} 淨值已全部公布 ({entry['published_at']}，第 {entry['probes']} 次查詢)")
+            return {n: seen[n] for n in names}
+
+        if len(missing) < len(names):
+            if entry["partial_at"] is None:
+                entry["partial_at"] = probe_at.strftime("%H:%M:%S")
+                delays = backoff_delays() # 開始公布了，改回最短間隔
+            print(f"⏳ {probe_at:%H:%M:%S} 部分公布，尚缺: {'、'.join(missing)}")
+        else:
+            print(f"⏳ {probe_at:%H:%M:%S} 尚未公布" if navs is not None else f"⚠️ {probe_at:%H:%M:%S} 連線失敗，稍後重試")
+        entry["missing"] = missing
+        log.save()
+
+        wait = next(delays)
+        if now() + timedelta(seconds=wait) > until:
+            print(f"⌛ 已到輪詢截止時間 {until:%H:%M}，{date_str} 仍未完整公布")
+            return None
+        sleep(wait)
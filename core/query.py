@@ -0,0 +1,77 @@
+from bisect import bisect_left, bisect_right
+from .registry import default_index
+from .snapshot import load_snapshot
+from .storage import mtime
+
+def _iso(date_str):
+    date_str = str(date_str)
+    return f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}" if len(date_str) == 8 else date_str
+
+class SnapshotView:
+    """
+    某一版快照的唯讀視圖 (建立後不再變動)：同一次頁面繪製拿同一個 view，數字前後一致
+    """
+    __slots__ = ("as_of", "nav_date", "generated_at", "kpis", "constituents", "dates", "values", "bars", "contributions", "mtime")
+
+    def __init__(self, snapshot, mtime):
+        self.as_of = snapshot["as_of"]
+        self.nav_date = snapshot.get("nav_date") # 成分股明細的淨值日期 (舊版快照沒有)
+        self.generated_at = snapshot.get("generated_at")
+        self.kpis = dict(snapshot["kpis"])
+        self.constituents = tuple(dict(c) for c in snapshot["constituents"])
+        self.dates = tuple(snapshot["series"]["dates"])
+        self.values = tuple(snapshot["series"]["values"])
+        self.bars = {period: tuple(tuple(b) for b in snapshot.get(period, [])) for period in ("weekly", "monthly")}
+        contributions = snapshot.get("contributions") or {"names": [], "points": []}
+        self.contributions = (tuple(contributions["names"]), tuple(tuple(p) for p in contributions["points"]))
+        self.mtime = mtime
+
+    def latest(self):
+        """ 最新一筆 (日期 YYYY-MM-DD, 指數值)；沒有資料回傳 (None, None) """
+        return (self.dates[-1], self.values[-1]) if self.dates else (None, None)
+
+    def history(self, start=None, end=None):
+        """ [start, end] 區間 (含頭尾，YYYYMMDD 或 YYYY-MM-DD 皆可) 的 [(日期, 指數值), ...] """
+        lo = bisect_left(self.dates, _iso(start)) if start else 0
+        hi = bisect_right(self.dates, _iso(end)) if end else len(self.dates)
+        return list(zip(self.dates[lo:hi], self.values[lo:hi]))
+
+class IndexQuery:
+    """
+    看板用的唯讀查詢介面：只讀每日排程 / 寫入端發布的快照檔，不連線、不寫檔、不加鎖
+    快照檔由寫入端以「暫存檔 + rename」原子替換；這裡發現檔案時間變了就載入成新的 SnapshotView，
+    再整個換掉參照 (舊 view 仍可被正在使用的讀者安全使用)
+    """
+    def __init__(self, index=None):
+        self.index = index or default_index()
+        self._view = None
+
+    def view(self):
+        """ 目前最新版本的唯讀視圖 """
+        path = self.index["snapshot"]
+        current = mtime(path) or 0
+        view = self._view
+        if view is None or view.mtime != current:
+            view = SnapshotView(self._load(path), current)
+            self._view = view # 單一參照賦值，讀者不需鎖
+        return view
+
+    def latest(self):
+        return self.view().latest()
+
+    def history(self, start=None, end=None):
+        return self.view().history(start, end)
+
+    def constituents(self):
+        return self.view().constituents
+
+    def kpis(self):
+        return self.view().kpis
+
+    def _load(self, path):
+        snapshot = load_snapshot(path)
+        if snapshot is None:
+            # 快照不存在或版本不符時才由本地檔案即時組出 (仍不連線、不寫檔)
+            from .engine import IndexEngine
+            snapshot = IndexEngine(self.index).build_snapshot()
+        return snapshot
@@ -0,0 +1,26 @@
+import threading
+import time
+
+class TokenBucket:
+    """ 令牌桶限速：平均每秒 rate 次請求，最多允許 capacity 次瞬間爆量 (可跨執行緒共用) """
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ 取得一枚令牌，不足時阻塞等待 (rate <= 0 代表不限速) """
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from .config import RAW_ARCHIVE_DIR
+from .parser import NavTableParser
+from .storage import mtime, changed, atomic_write, atomic_write_json
+
+# ASP.NET 的 ViewState / EventValidation 每次回應都不同、又佔頁面一大塊，與淨值無關：存檔前清空，相同內容才能去重
+_STATE_RE = re.compile(r'(<input\b[^>]*\bname="(?:__VIEWSTATE|__EVENTVALIDATION)"[^>]*\bvalue=")[^"]*(")', re.I)
+
+class RawArchive:
+    """
+    公會查詢結果的原始頁面存檔 (規則改了可離線重新解析，不必重爬)
+    - data/raw/<sha256>.html.gz：gzip 壓縮、以內容雜湊命名，相同內容只存一份
+    - data/raw/index.json：{日期: {投信代號 ('' 為全部): 雜湊}}
+    爬蟲多執行緒共用；index 需呼叫 save() 落地 (暫存檔 + rename)
+    """
+    def __init__(self, directory=RAW_ARCHIVE_DIR):
+        self.directory = directory
+        self.index_file = os.path.join(directory, 'index.json')
+        self._index = None
+        self._dirty = False
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def put(self, date_str, html, comid=''):
+        """ 存一頁；回傳內容雜湊 """
+        data = _STATE_RE.sub(r'\1\2', html).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            atomic_write(path, lambda f: f.write(data), 'wb', opener=gzip.open, compresslevel=6)
+        with self._lock:
+            self._load().setdefault(str(date_str), {})[comid] = digest
+            self._dirty = True
+        return digest
+
+    def entries(self, start=None, end=None):
+        """ [(日期, 投信代號, 雜湊), ...]，依日期排序 (含頭尾，None 代表不設限) """
+        return [
+            (d, comid, digest)
+            for d, pages in sorted(self._load().items())
+            if (not start or d >= str(start)) and (not end or d <= str(end))
+            for comid, digest in sorted(pages.items())
+        ]
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, f"{digest}.html.gz")
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            atomic_write_json(self.index_file, self._index, indent=1, sort_keys=True)
+            self._mtime = mtime(self.index_file)
+            self._dirty = False
+
+    def refresh(self):
+        """ 索引檔被其他行程改過 (且沒有未寫入的紀錄) 時，下次使用重新讀檔 """
+        with self._lock:
+            if self._index is not None and not self._dirty and changed(self.index_file, self._mtime):
+                self._index = None
+
+    def _load(self):
+        if self._index is None:
+            self._index = {}
+            self._mtime = mtime(self.index_file)
+            if os.path.exists(self.index_file):
+                try:
+                    with open(self.index_file, 'r', encoding='utf-8') as f:
+                        self._index = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"RawArchive Error: {e}")
+        return self._index
+
+def reparse_day(job):
+    """
+    (子行程用) 重新解析某一天的所有存檔頁面並合併
+    job: (日期, [頁面檔路徑...], target_funds)；輸出: (日期, 淨值 Dict)，頁面沒有淨值表格時為 {}
+    """
+    date_str, paths, target_funds = job
+    parser = NavTableParser(target_funds)
+    navs = {}
+    for path in paths:
+        with gzip.open(path, 'rb') as f:
+            found = parser.parse(f.read().decode('utf-8'))
+        if found is None:
+            return date_str, {} # 查無資料 (休市)
+        navs.update(found)
+    return date_str, navs
@@ -0,0 +1,50 @@
+import json
+import os
+from .config import DATA_DIR, INDEX_REGISTRY_FILE, INDEX_CONFIG_FILE, HISTORY_FILE, SNAPSHOT_FILE, METRICS_STATE_FILE, TARGET_FUNDS
+
+# 每個指數各自的檔案 (registry 內未指定時，依 id 自動命名)
+_INDEX_FILES = {
+    "config": "_config.json",
+    "history": "_history.csv",
+    "snapshot": "_snapshot.json",
+    "metrics": "_metrics.json",
+}
+
+def default_index():
+    """ 原本的 TSF-Top5 (沿用既有檔名) """
+    return {
+        "id": "tsf-top5",
+        "name": "TSF-Top5",
+        "config": INDEX_CONFIG_FILE,
+        "history": HISTORY_FILE,
+        "snapshot": SNAPSHOT_FILE,
+        "metrics": METRICS_STATE_FILE,
+    }
+
+def load_registry(path=INDEX_REGISTRY_FILE):
+    """
+    讀取指數清單 (data/index_registry.json)，檔案路徑皆相對於 data 資料夾
+    檔案不存在時只有預設的 TSF-Top5
+    """
+    if not os.path.exists(path):
+        return [default_index()]
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)["indices"]
+
+    indices = []
+    for entry in entries:
+        index = dict(entry)
+        index.setdefault("name", index["id"])
+        for key, suffix in _INDEX_FILES.items():
+            index[key] = os.path.join(DATA_DIR, index.get(key) or f"{index['id']}{suffix}")
+        indices.append(index)
+    return indices
+
+def fund_keywords(indices):
+    """ 合併所有指數的成分股關鍵字：config.TARGET_FUNDS + 各指數設定檔內的 funds 欄位 """
+    funds = dict(TARGET_FUNDS)
+    for index in indices:
+        if os.path.exists(index["config"]):
+            with open(index["config"], 'r', encoding='utf-8') as f:
+                funds.update(json.load(f).get("funds", {}))
+    return funds
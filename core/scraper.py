@@ -1,72 +1,237 @@
-import requests
-from bs4 import BeautifulSoup
-import urllib3
-from .config import SITCA_URL, TARGET_FUNDS # 引用設定
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .config import SITCA_URL, TARGET_FUNDS, SITCA_RATE_LIMIT, SITCA_RATE_BURST, BATCH_WORKERS, COMPANY_FILTER # 引用設定
+from .ratelimit import TokenBucket
+from .parser import NavTableParser, parse_hidden_inputs, parse_select_options
+from .companies import CompanyMap
+from .tracing import span
 
-# 關閉 SSL 警告
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+COMID_FIELD = 'ctl00$ContentPlaceHolder1$ddlQ_Comid'
+DATE_FIELD = 'ctl00$ContentPlaceHolder1$txtQ_Date'
+_CLOSED = object() # 公司篩選時第一家就沒有淨值表格：整天休市
 
 class SitcaScraper:
-    """ 負責從公會抓取官方淨值 (無狀態，只負責抓) """
-    def __init__(self):
-        self.session = requests.Session()
+    """
+    負責從公會抓取官方淨值 (無狀態，只負責抓)
+    target_funds: 要擷取的基金關鍵字 (多個指數共用同一次抓取時傳入聯集)
+    record_dir: 把每天的查詢結果存成 <日期>.html (錄製測試資料)
+    replay_dir: 不連線，直接讀 <日期>.html 重播 (檔案不存在視為查無資料)
+    archive: 全市場淨值存檔 (universe.NavArchive)；有給時每一頁所有基金的淨值都會存下，需呼叫 flush() 落地
+    raw_archive: 原始頁面存檔 (raw_archive.RawArchive)；有給時每個查詢回應都壓縮存下，需呼叫 flush() 落地
+    company_filter: 單日查詢依成分股所屬投信分別查詢 (批次補齊一律查全部；錄製/重播/兩種存檔需要完整頁面，這些模式下自動關閉)
+    """
+    def __init__(self, rate_limit=SITCA_RATE_LIMIT, burst=SITCA_RATE_BURST, url=SITCA_URL, record_dir=None, replay_dir=None, workers=BATCH_WORKERS, target_funds=TARGET_FUNDS, archive=None, company_filter=COMPANY_FILTER, raw_archive=None):
+        self.url = url
+        self.archive = archive
+        self.raw_archive = raw_archive
+        full_page = record_dir or replay_dir or archive is not None or raw_archive is not None
+        self.companies = CompanyMap() if company_filter and not full_page else None
+        self.workers = workers
+        self.record_dir = record_dir
+        self.replay_dir = replay_dir
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Referer": SITCA_URL
+            "Referer": url
         }
+        # 所有執行緒共用同一個令牌桶，整體速率受控
+        self.bucket = TokenBucket(rate_limit, burst)
+        # 每個執行緒各自持有 Session 與 ViewState (requests.Session 非執行緒安全)
+        self._local = threading.local()
+        self.parser = NavTableParser(target_funds)
 
-    def fetch_data(self, date_str):
+    @property
+    def session(self):
+        return self._state().session
+
+    def fetch_data(self, date_str, by_company=True):
         """
         輸入: "20260127"
-        輸出: Dict {'統一奔騰': 120.5, ...} 或 None
+        輸出: Dict {'統一奔騰': 120.5, ...}；查無資料 (頁面沒有淨值表格，假日) 回傳空 Dict；
+              連線錯誤，或有表格卻一檔成分股都找不到 (關鍵字需調整) 回傳 None，呼叫端不可記成休市
+        by_company=False 時不走公司篩選 (批次補齊：令牌桶限的是請求數，一天查一次全部比查好幾家快)
         """
+        missing, unpublished = None, []
+        groups = self.companies.groups(self.parser.target_funds) if self.companies is not None and by_company else None
+        if groups:
+            # 只查成分股所屬的投信，每頁只有該公司的基金
+            fetched = self._fetch_companies(date_str, groups)
+            if fetched is None or fetched is _CLOSED:
+                return None if fetched is None else {}
+            results, unpublished = fetched
+            missing = [n for n in self.parser.target_funds if n not in results]
+            if not missing:
+                return results
+
+        # 全部查詢：公司對應未知，或公司篩選結果缺成分股時確認一次
+        html = self.fetch_page(date_str)
+        if html is None:
+            return None
+        results = self._parse(date_str, html)
+        if results is None:
+            # 查詢頁正常回應但沒有淨值表格才是查無資料 (可能假日)；其他頁面 (維護中、被擋) 視同連線錯誤
+            return {} if self._is_query_page(html) else None
+        if not results:
+            # 有淨值表格卻一檔都沒對到：不是休市，多半是基金改名、關鍵字需調整
+            print(f"Scraper Warning: {date_str} 頁面有淨值表格但找不到任何成分股")
+            return None
+        if self.companies is not None:
+            # 順便用頁面上的投信下拉選單學習公司對應，下次起改走公司篩選
+            self.companies.learn(parse_select_options(html, COMID_FIELD), self.parser.target_funds)
+            if missing:
+                # 該公司頁面有表格卻沒有這檔、全部查詢卻有：對應有誤 (公司頁尚未公布的不算)
+                self.companies.forget([n for n in missing if n in results and n not in unpublished])
+        return results
+
+    def fetch_page(self, date_str, comid=''):
+        """ 取得單日查詢結果的原始 HTML (comid 為投信代號，空字串代表全部；重播模式改讀錄製檔)；連線錯誤或非 200 回應回傳 None """
+        if self.replay_dir:
+            return self._replay(date_str)
         try:
-            # 1. 取得隱藏欄位 (ViewState)
-            r = self.session.get(SITCA_URL, headers=self.headers, verify=False)
-            soup = BeautifulSoup(r.text, 'html.parser')
-            payload = {tag.get('name'): tag.get('value', '') for tag in soup.find_all('input') if tag.get('name')}
-            
-            # 2. 填入查詢參數
-            payload.update({
-                'ctl00$ContentPlaceHolder1$txtQ_Date': date_str,
-                'ctl00$ContentPlaceHolder1$ddlQ_Comid': '',
-                'ctl00$ContentPlaceHolder1$BtnQuery': '查詢'
-            })
-            
-            # 3. 送出 POST
-            r_post = self.session.post(SITCA_URL, data=payload, headers=self.headers, verify=False)
-            
-            # 4. 解析表格
-            tables = BeautifulSoup(r_post.text, 'html.parser').find_all('table')
-            # 透過特徵尋找正確表格
-            data_table = next((t for t in tables if "基金名稱" in t.text and "淨值" in t.text), None)
-            
-            if not data_table:
-                return None # 查無資料 (可能假日)
-
-            results = {}
-            for row in data_table.find_all('tr'):
-                text = row.text
-                for name, keywords in TARGET_FUNDS.items():
-                    # 邏輯：必須包含主關鍵字
-                    if keywords[0] in text:
-                        # 過濾次要關鍵字 (如 "T", "累積")
-                        if len(keywords) > 1 and not any(k in text for k in keywords[1:]):
-                            continue
-
-                        cols = row.find_all('td')
-                        col_texts = [c.text.strip() for c in cols]
-                        
-                        # 智能定位 "TWD" 右邊那一欄
-                        for i, val in enumerate(col_texts):
-                            if val == 'TWD' and i+1 < len(col_texts):
-                                try:
-                                    nav = float(col_texts[i+1].replace(',', '')) # 去除逗號
-                                    results[name] = nav
-                                except: pass
-                                break
-            return results
+            # 1. 沿用上次的隱藏欄位 (ViewState)，沒有才 GET 一次
+            state = self._state()
+            reused = state.form is not None
+            r_post = self._post_query(self._form_payload(), date_str, comid)
+
+            # ViewState 失效時伺服器不會回傳表單，重新 GET 後再試一次
+            if reused and (r_post.status_code != 200 or '__VIEWSTATE' not in r_post.text):
+                state.form = None
+                r_post = self._post_query(self._form_payload(), date_str, comid)
+
+            # 503 / 403 / 429 等錯誤頁沒有淨值表格，不能當成查無資料 (否則會被記成休市日)
+            if r_post.status_code != 200:
+                state.form = None
+                print(f"Scraper Error: HTTP {r_post.status_code} ({date_str})")
+                return None
+
+            # 4. 把回應中的新 ViewState 留給下一次查詢
+            form = parse_hidden_inputs(r_post.text)
+            if '__VIEWSTATE' in form:
+                state.form = form
+
+            if self.record_dir:
+                self._record(date_str, r_post.text)
+            if self.raw_archive is not None:
+                self.raw_archive.put(date_str, r_post.text, comid)
+            return r_post.text
 
         except Exception as e:
+            self._state().form = None # 連線異常時丟棄 ViewState，下次重新取得
             print(f"Scraper Error: {e}") # 僅在後台印出錯誤以便除錯
-            return None
\ No newline at end of file
+            return None
+
+    def flush(self):
+        """ 將全市場存檔、原始頁面索引與公司對應寫入磁碟 (沒開的不做事) """
+        if self.archive is not None:
+            self.archive.save()
+        if self.raw_archive is not None:
+            self.raw_archive.save()
+        if self.companies is not None:
+            self.companies.save()
+
+    def refresh(self):
+        """ 寫入端取得寫入鎖後呼叫：公司對應與存檔索引若被其他行程改過，下次使用重新讀檔 """
+        for store in (self.archive, self.raw_archive, self.companies):
+            if store is not None:
+                store.refresh()
+
+    def add_funds(self, funds):
+        """ 追加要擷取的基金關鍵字 (重建 matcher) """
+        self.parser = NavTableParser({**self.parser.target_funds, **funds})
+
+    def fetch_many(self, date_list, workers=None):
+        """
+        批次抓取：有上限的執行緒池 + 令牌桶限速
+        輸出: 依輸入順序逐筆產生 (date_str, navs)，方便呼叫端照日期順序寫入
+        """
+        # 立即送出所有工作 (不等呼叫端開始迭代)，池子數量有上限，速率由令牌桶控制
+        pool = ThreadPoolExecutor(max_workers=max(1, min(workers or self.workers, len(date_list))))
+        futures = [pool.submit(self.fetch_data, d, False) for d in date_list]
+        pool.shutdown(wait=False)
+        return ((d, f.result()) for d, f in zip(date_list, futures))
+
+    def _fetch_companies(self, date_str, groups):
+        """
+        依投信逐一查詢並合併 (同一執行緒沿用 ViewState)
+        第一家就沒有淨值表格視為整天休市 (_CLOSED)；之後某家沒有表格 (尚未公布) 則保留其他家的結果，
+        有表格卻沒對到的同樣保留，缺的成分股都由 fetch_data 改查全部確認 (輪詢時才看得出「部分公布」)
+        輸出: (淨值 Dict, 頁面尚未公布的成分股)；連線錯誤回傳 None
+        """
+        results, unpublished = {}, []
+        for i, (comid, names) in enumerate(groups.items()):
+            html = self.fetch_page(date_str, comid)
+            if html is None:
+                return None
+            navs = self._parse(date_str, html, comid)
+            if navs is None:
+                if not self._is_query_page(html):
+                    return None
+                if i == 0:
+                    return _CLOSED # 查無資料：整天休市，其餘公司不必再查
+                unpublished += names
+                continue
+            results.update(navs)
+        return results, unpublished
+
+    def _is_query_page(self, html):
+        """ 是否為公會查詢頁 (有日期查詢欄位)；重播模式缺檔 (空字串) 同樣視為查無資料 """
+        return DATE_FIELD in html or (self.replay_dir is not None and html == "")
+
+    def _parse(self, date_str, html, comid=''):
+        with span("scraper.parse", date=date_str, comid=comid, bytes=len(html)) as sp:
+            results = self.parser.parse(html)
+            if self.archive is not None and results is not None:
+                universe = self.parser.parse_universe(html)
+                self.archive.add(date_str, universe)
+                sp.set(universe=len(universe))
+            sp.set(rows=len(results) if results is not None else 0)
+        return results
+
+    def _state(self):
+        """ 取得本執行緒專屬的 Session / ViewState """
+        if not hasattr(self._local, 'session'):
+            # requests 只在真的要連線時才載入 (快取命中、重播模式都不需要，可省下啟動時間)
+            import requests
+            import urllib3
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning) # 關閉 SSL 警告
+            self._local.session = requests.Session()
+            self._local.form = None
+        return self._local
+
+    def _form_payload(self):
+        """ 1. 取得隱藏欄位 (ViewState)；同一執行緒內重複使用 """
+        state = self._state()
+        if state.form is None:
+            self.bucket.acquire()
+            with span("scraper.get") as sp:
+                r = state.session.get(self.url, headers=self.headers, verify=False)
+                sp.set(status=r.status_code, bytes=len(r.content))
+            state.form = parse_hidden_inputs(r.text)
+        return dict(state.form)
+
+    def _post_query(self, payload, date_str, comid=''):
+        # 2. 填入查詢參數
+        payload.update({
+            DATE_FIELD: date_str,
+            COMID_FIELD: comid,
+            'ctl00$ContentPlaceHolder1$BtnQuery': '查詢'
+        })
+
+        # 3. 送出 POST
+        self.bucket.acquire()
+        with span("scraper.post", date=date_str, comid=comid) as sp:
+            r = self.session.post(self.url, data=payload, headers=self.headers, verify=False)
+            sp.set(status=r.status_code, bytes=len(r.content))
+        return r
+
+    def _record(self, date_str, html):
+        os.makedirs(self.record_dir, exist_ok=True)
+        with open(os.path.join(self.record_dir, f"{date_str}.html"), 'w', encoding='utf-8') as f:
+            f.write(html)
+
+    def _replay(self, date_str):
+        path = os.path.join(self.replay_dir, f"{date_str}.html")
+        if not os.path.exists(path):
+            return ""
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
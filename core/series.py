@@ -0,0 +1,85 @@
+from datetime import date as _date, timedelta
+
+# 圖表序列工具 (純 Python，每日排程與前端都不需 numpy/pandas)
+# - LTTB 降採樣：保留走勢形狀 (高低點) 的前提下把點數壓到指定上限
+# - 週 / 月 OHLC 聚合：每新增一天只更新最後一根，由 MetricsState 增量維護
+
+PERIODS = ("weekly", "monthly")
+
+def period_key(date_str, period):
+    """ 日期所屬的週 (該週一) 或月 (該月 1 日)，皆為 YYYYMMDD 字串，可直接比較大小 """
+    if period == "monthly":
+        return date_str[:6] + "01"
+    d = _date(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
+    return (d - timedelta(days=d.weekday())).strftime("%Y%m%d")
+
+def ohlc_push(bars, date_str, value, period):
+    """ O(1) 併入一天：同一期更新最後一根 [期別, 開, 高, 低, 收]，新的一期則新增一根 """
+    key = period_key(date_str, period)
+    if bars and bars[-1][0] == key:
+        bar = bars[-1]
+        bar[2] = max(bar[2], value)
+        bar[3] = min(bar[3], value)
+        bar[4] = value
+    else:
+        bars.append([key, value, value, value, value])
+
+def ohlc(history_rows, period):
+    """ 整段重算 (沒有增量狀態時的後備)：[(日期, 指數值), ...] -> [[期別, 開, 高, 低, 收], ...] """
+    bars = []
+    for d, v in history_rows:
+        ohlc_push(bars, d, v, period)
+    return bars
+
+def lttb(xs, ys, threshold):
+    """
+    Largest-Triangle-Three-Buckets 降採樣：保留頭尾，中間每個桶挑出與前一點、下一桶平均點
+    圍成三角形面積最大的那一點；x 只需可排序的序號 (用索引即可)，回傳被選中的索引列表
+    """
+    n = len(ys)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    picked = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # 下一桶的平均點
+        lo = int((i + 1) * every) + 1
+        hi = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[lo:hi]) / (hi - lo)
+        avg_y = sum(ys[lo:hi]) / (hi - lo)
+
+        # 目前桶內面積最大的點
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+    picked.append(n - 1)
+    return picked
+
+def chart_series(dates, values, bars, max_points):
+    """
+    依可見區間挑選解析度，讓送到瀏覽器的點數不超過 max_points 左右
+    dates/values: 區間內的日線；bars: {'weekly': [...], 'monthly': [...]} 區間內的 K 棒
+    輸出: (解析度名稱, 日期列表, 收盤值列表, 該解析度的 K 棒或 None)
+    - 日線點數在上限內：原始日線
+    - 不超過上限 4 倍：LTTB 降採樣日線 (保留高低點)
+    - 否則改用週線，週線仍太多則用月線 (月線再超過才降採樣)
+    """
+    n = len(values)
+    if n <= max_points:
+        return "daily", dates, values, None
+    if n <= max_points * 4:
+        keep = lttb(range(n), values, max_points)
+        return "lttb", [dates[i] for i in keep], [values[i] for i in keep], None
+    period = "weekly" if len(bars["weekly"]) <= max_points else "monthly"
+    chosen = bars[period]
+    keep = lttb(range(len(chosen)), [b[4] for b in chosen], max_points)
+    chosen = [chosen[i] for i in keep]
+    return period, [b[0] for b in chosen], [b[4] for b in chosen], chosen
@@ -0,0 +1,79 @@
+import json
+import math
+import os
+from datetime import datetime
+from .config import SNAPSHOT_FILE
+from .series import PERIODS, ohlc
+from .storage import atomic_write_json
+
+SNAPSHOT_VERSION = 2 # 格式變更時遞增，前端遇到不認得的版本會改走即時計算
+
+def compute_kpis(values):
+    """ 由指數序列算出看板數字 (純 Python，不需 pandas)：最新值、日變動、YTD、MDD、Sharpe """
+    if not values:
+        return {"latest": 100.0, "delta": 0.0, "ytd": 0.0, "mdd": 0.0, "sharpe": 0.0}
+
+    latest = values[-1]
+    delta = latest - values[-2] if len(values) >= 2 else 0.0
+    ytd = (latest - values[0]) / values[0] * 100
+
+    peak, mdd = values[0], 0.0
+    for v in values:
+        peak = max(peak, v)
+        mdd = min(mdd, (v - peak) / peak)
+
+    rets = [b / a - 1 for a, b in zip(values, values[1:])]
+    sharpe = 0.0
+    if len(rets) >= 2:
+        mean = sum(rets) / len(rets)
+        std = math.sqrt(sum((r - mean) ** 2 for r in rets) / (len(rets) - 1)) # 與 pandas .std() 相同 (ddof=1)
+        if std != 0:
+            sharpe = mean / std * (252 ** 0.5)
+    return {"latest": latest, "delta": delta, "ytd": ytd, "mdd": mdd * 100, "sharpe": sharpe}
+
+def _iso(d):
+    return f"{d[:4]}-{d[4:6]}-{d[6:]}"
+
+def build_snapshot(history_rows, details, kpis=None, bars=None, contributions=None, nav_date=None):
+    """
+    history_rows: [(日期, 指數值), ...] (已排序)；details: 成分股明細 (engine.get_latest_details)
+    nav_date: 明細淨值所屬的日期 (快取中成分股淨值齊全的最新一天，可能早於 as_of)
+    kpis / bars: 已由增量狀態 (MetricsState) 算好的看板數字與週/月 K 棒，未給則整段重算
+    contributions: 各成分股每日貢獻點數 (engine.contribution_points)，與 series 日期對齊
+    輸出: 前端直接可用的 dict (圖表日期已轉成 YYYY-MM-DD)
+    """
+    values = [v for _, v in history_rows]
+    bars = bars or {period: ohlc(history_rows, period) for period in PERIODS}
+    return {
+        "version": SNAPSHOT_VERSION,
+        "generated_at": datetime.now().isoformat(timespec='seconds'),
+        "as_of": history_rows[-1][0] if history_rows else None,
+        "nav_date": nav_date,
+        "kpis": kpis or compute_kpis(values),
+        "constituents": [
+            {"name": d["基金名稱"], "nav": d["最新淨值"], "weight": d["權重"]} for d in details
+        ],
+        "series": {
+            "dates": [_iso(d) for d, _ in history_rows],
+            "values": values,
+        },
+        # 長區間走勢改用週 / 月 K 棒 (期別為該週一 / 該月 1 日)
+        **{period: [[_iso(b[0]), *b[1:]] for b in bars[period]] for period in PERIODS},
+        "contributions": contributions or {"names": [], "points": []},
+    }
+
+def write_snapshot(snapshot, path=SNAPSHOT_FILE):
+    """ 先寫暫存檔再 rename，前端不會讀到寫一半的檔案 """
+    atomic_write_json(path, snapshot, ensure_ascii=False, separators=(',', ':'))
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """ 讀取快照；檔案不存在、損毀或版本不符時回傳 None """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Snapshot Error: {e}")
+        return None
+    return snapshot if snapshot.get("version") == SNAPSHOT_VERSION else None
@@ -0,0 +1,29 @@
+import json
+import os
+import threading
+
+# 資料檔的共用規則 (快取、存檔索引、狀態檔、快照、設定檔都走這裡)：
+# - 是否被其他行程改過：比對修改時間 (mtime)，長駐的寫入端取得寫入鎖後據此決定要不要重新讀檔
+# - 寫入：先寫暫存檔再 os.replace 原子替換，讀取端 (看板、其他行程) 不會看到寫一半的檔案
+
+def mtime(path):
+    """ 檔案修改時間；不存在回傳 None """
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+def changed(path, seen):
+    """ 檔案的修改時間是否與上次讀寫時記下的 seen 不同 (被其他行程改過、建立或刪除) """
+    return mtime(path) != seen
+
+def atomic_write(path, write, mode='w', opener=open, **kwargs):
+    """
+    write(f) 寫入暫存檔後原子替換 path；opener / mode / kwargs 決定暫存檔如何開啟 (例如 gzip.open, 'wb')
+    暫存檔名含執行緒代號，多執行緒同時寫同一個檔也不會互踩
+    """
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with opener(tmp_path, mode, **kwargs) as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def atomic_write_json(path, data, **json_kwargs):
+    """ 以 UTF-8 JSON 原子寫入 (json_kwargs 直接傳給 json.dump，決定縮排、排序等格式) """
+    atomic_write(path, lambda f: json.dump(data, f, **json_kwargs), encoding='utf-8')
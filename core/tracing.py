@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from .config import TRACE_FILE
+
+class _NullSpan:
+    """ 關閉記錄時共用的空物件：沒有計時、沒有配置，幾乎零成本 """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {"span": self.name, "ts": time.time(), "ms": (time.perf_counter() - self.start) * 1000}
+        record.update(self.attrs)
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.emit(record)
+        return False
+
+    def set(self, **attrs):
+        """ 區段執行中補上屬性 (傳輸位元組、快取命中、筆數...) """
+        self.attrs.update(attrs)
+
+class Tracer:
+    """
+    熱路徑計時：每個區段寫成一行 JSON (JSON Lines)，結束時輸出 p50/p95/max 摘要
+    未設定 TSF_TRACE_FILE 時完全關閉
+    """
+    def __init__(self, path=TRACE_FILE):
+        self.path = path
+        self.enabled = bool(path)
+        self._durations = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, attrs)
+
+    def emit(self, record):
+        with self._lock:
+            self._durations.setdefault(record["span"], []).append(record["ms"])
+        self._write(record)
+
+    def summary(self):
+        """ 各區段的次數與 p50 / p95 / max (毫秒) """
+        with self._lock:
+            durations = {name: sorted(ms) for name, ms in self._durations.items()}
+        return {
+            name: {
+                "count": len(ms),
+                "p50": ms[int(0.50 * (len(ms) - 1))],
+                "p95": ms[int(round(0.95 * (len(ms) - 1)))],
+                "max": ms[-1],
+            }
+            for name, ms in durations.items()
+        }
+
+    def write_summary(self):
+        """ 把摘要寫入記錄檔並印在日誌 (GitHub Actions 上直接看得到) """
+        if not self.enabled:
+            return
+        summary = self.summary()
+        self._write({"summary": summary, "ts": time.time()})
+        print(f"⏱️ {'區段':<24}{'次數':>6}{'p50ms':>10}{'p95ms':>10}{'maxms':>10}")
+        for name, st in sorted(summary.items()):
+            print(f"   {name:<24}{st['count']:>6}{st['p50']:>10.1f}{st['p95']:>10.1f}{st['max']:>10.1f}")
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + "\n")
+            self._file.flush()
+
+tracer = Tracer() # 全程式共用
+
+def span(name, **attrs):
+    return tracer.span(name, **attrs)
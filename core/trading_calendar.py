@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from .config import HOLIDAY_FILE, CLOSED_DAYS_FILE, CLOSED_DAY_TTL_DAYS, RECENT_CLOSED_TTL_HOURS
+from .storage import mtime, changed, atomic_write_json
+
+class TradingCalendar:
+    """
+    交易日曆：跳過週末、假日檔內的休市日，以及「曾經查無資料」而學到的休市日
+    (學到的休市日是有期限的負向快取，過期後才會再向公會查詢)
+    """
+    def __init__(self, holiday_file=HOLIDAY_FILE, closed_file=CLOSED_DAYS_FILE):
+        self.holiday_file = holiday_file
+        self.closed_file = closed_file
+        self.holidays, self.extra_open = self._load_holidays(holiday_file)
+        self._closed = None
+        self._dirty = False
+        self._mtime = None
+
+    def is_trading_day(self, date_str):
+        date_str = str(date_str)
+        if date_str in self.extra_open:
+            return True
+        if date_str in self.holidays or self._is_known_closed(date_str):
+            return False
+        return datetime.strptime(date_str, "%Y%m%d").weekday() < 5
+
+    def trading_days(self, start_date, end_date):
+        """ 輸入 datetime 區間 (含頭尾)，回傳需要查詢的日期字串列表 """
+        days = []
+        dt = start_date
+        while dt <= end_date:
+            d_str = dt.strftime("%Y%m%d")
+            if self.is_trading_day(d_str):
+                days.append(d_str)
+            dt += timedelta(days=1)
+        return days
+
+    def mark_closed(self, date_str, save=True):
+        """
+        記錄查無資料的日期
+        近幾天的日期可能只是公會尚未公布，只快取幾小時；較舊的日期才長期快取
+        """
+        date_str = str(date_str)
+        age = datetime.now() - datetime.strptime(date_str, "%Y%m%d")
+        if age < timedelta(days=3):
+            ttl = RECENT_CLOSED_TTL_HOURS * 3600
+        else:
+            ttl = CLOSED_DAY_TTL_DAYS * 86400
+        self._load_closed()[date_str] = time.time() + ttl
+        self._dirty = True
+        if save:
+            self.save()
+
+    def save(self):
+        if not self._dirty:
+            return
+        atomic_write_json(self.closed_file, self._closed, indent=1, sort_keys=True)
+        self._mtime = mtime(self.closed_file)
+        self._dirty = False
+
+    def refresh(self):
+        """ 負向快取檔被其他行程改過 (且沒有未寫入的紀錄) 時，下次使用重新讀檔 """
+        if self._closed is not None and not self._dirty and changed(self.closed_file, self._mtime):
+            self._closed = None
+
+    def _is_known_closed(self, date_str):
+        expires = self._load_closed().get(date_str)
+        return expires is not None and expires > time.time()
+
+    def _load_closed(self):
+        """ 延遲載入負向快取，順便清掉過期的紀錄 """
+        if self._closed is None:
+            self._closed = {}
+            self._mtime = mtime(self.closed_file)
+            if os.path.exists(self.closed_file):
+                try:
+                    with open(self.closed_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    now = time.time()
+                    self._closed = {d: exp for d, exp in data.items() if exp > now}
+                    self._dirty = len(self._closed) != len(data)
+                except (OSError, ValueError) as e:
+                    print(f"Calendar Error: {e}")
+        return self._closed
+
+    @staticmethod
+    def _load_holidays(path):
+        """
+        假日檔格式：每行一個 YYYYMMDD，# 之後為註解
+        以 + 開頭的日期代表「週末但有開市」(補班交易日)
+        """
+        holidays, extra_open = set(), set()
+        if not os.path.exists(path):
+            return holidays, extra_open
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                token = line.split('#', 1)[0].strip()
+                if not token:
+                    continue
+                if token.startswith('+'):
+                    extra_open.add(token[1:].strip())
+                else:
+                    holidays.add(token)
+        return holidays, extra_open
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import numpy as np
+from .config import UNIVERSE_DIR, SCREEN_WINDOW, SCREEN_MIN_COVERAGE
+from .storage import mtime, changed, atomic_write, atomic_write_json
+
+SCREEN_METRICS = ("return", "volatility", "drawdown", "sharpe")
+
+class NavArchive:
+    """
+    全市場淨值欄式存檔 (成分股篩選用)，只新增、不改寫舊檔 (每日排程把 data/ 提交進 git 也不會每天重存一份大檔)
+    - funds.json: 欄位順序 (欄位索引即基金 id，新基金只加在最後)
+    - navs-<序號>.npy: 每次 save() 新增一塊 日期 × 基金 的 float32 矩陣 (缺值為 NaN，欄數為當時的基金數)
+    - chunks.json: [{'file', 'dates'}, ...] 依寫入順序，同一天出現在多塊時以後寫的為準；最後才寫，作為提交點
+    讀取時各塊以 memory-map 開啟再組成一個矩陣；爬蟲每解析一頁就 add() 一天 (執行緒安全)，save() 時才落地
+    """
+    def __init__(self, directory=UNIVERSE_DIR):
+        self.directory = directory
+        self._funds = None
+        self._dates = None
+        self._navs = None
+        self._chunks = None
+        self._mtime = None
+        self._pending = {}   # 日期 -> {基金名稱: 淨值}，尚未落地
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        self._load()
+        return len(self._dates)
+
+    def add(self, date_str, navs):
+        """ 暫存單日全市場淨值 (同一天重複加入以後者為準) """
+        if navs:
+            with self._lock:
+                self._pending[str(date_str)] = navs
+
+    def save(self):
+        """ 暫存的日期寫成新的一塊：新基金加在 funds.json 最後，舊的塊與欄位順序都不動 """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        self._load()
+        funds = list(self._funds)
+        col = {name: j for j, name in enumerate(funds)}
+        for navs in pending.values():
+            for name in navs:
+                if name not in col:
+                    col[name] = len(funds)
+                    funds.append(name)
+        dates = sorted(pending)
+
+        chunk = np.full((len(dates), len(funds)), np.nan, dtype=np.float32)
+        for i, d in enumerate(dates):
+            navs = pending[d]
+            chunk[i, [col[n] for n in navs]] = list(navs.values())
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"navs-{len(self._chunks) + 1:05d}.npy"
+        chunks = self._chunks + [{"file": name, "dates": dates}]
+        atomic_write(os.path.join(self.directory, name), lambda f: np.save(f, chunk), 'wb')
+        atomic_write_json(os.path.join(self.directory, 'funds.json'), funds, ensure_ascii=False)
+        atomic_write_json(os.path.join(self.directory, 'chunks.json'), chunks, indent=1)
+        self._funds = None # 下次讀取時重新組合
+
+    def refresh(self):
+        """ 其他行程新增了塊 (chunks.json 改過) 時，下次使用重新組合；寫入端取得寫入鎖後呼叫 """
+        if self._funds is not None and changed(os.path.join(self.directory, 'chunks.json'), self._mtime):
+            self._funds = None
+
+    def matrix(self, start=None, end=None):
+        """ 回傳 [start, end] 區間的 (日期列表, 基金列表, 日期 × 基金 矩陣) """
+        self._load()
+        lo = np.searchsorted(self._dates, str(start)) if start else 0
+        hi = np.searchsorted(self._dates, str(end), side='right') if end else len(self._dates)
+        return self._dates[lo:hi], self._funds, self._navs[lo:hi]
+
+    def screen(self, metric="return", window=SCREEN_WINDOW, top=5, end=None, min_coverage=SCREEN_MIN_COVERAGE):
+        """
+        全市場排名：取截至 end 的最近 window 個交易日，一次算出所有基金的
+        報酬 (%)、年化波動 (%)、最大回撤 (%)、Sharpe，依 metric 排序 (波動越低越前面，其餘越高越前面)
+        回看期間有淨值的天數比例低於 min_coverage 的基金不列入
+        輸出: [{'name', 'return', 'volatility', 'drawdown', 'sharpe', 'coverage'}, ...] 前 top 名
+        """
+        if metric not in SCREEN_METRICS:
+            raise ValueError(f"metric 必須是 {SCREEN_METRICS} 之一")
+        dates, funds, navs = self.matrix(end=end)
+        navs = np.asarray(navs[-(window + 1):], dtype=np.float64)
+        if navs.shape[0] < 2:
+            return []
+
+        valid = ~np.isnan(navs)
+        coverage = valid.mean(axis=0)
+        keep = np.flatnonzero(coverage >= min_coverage)
+        navs, valid = navs[:, keep], valid[:, keep]
+
+        # 缺值沿用前一個有效淨值 (forward fill)；期初就缺的仍為 NaN
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(navs))[:, None], 0), axis=0)
+        filled = np.take_along_axis(navs, last_valid, axis=0)
+        first = navs[valid.argmax(axis=0), np.arange(navs.shape[1])]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rets = filled[1:] / filled[:-1] - 1
+            total = (filled[-1] / first - 1) * 100
+            mean = np.nanmean(rets, axis=0)
+            std = np.nanstd(rets, axis=0, ddof=1)
+            vol = std * np.sqrt(252) * 100
+            sharpe = np.where(std > 0, mean / std * np.sqrt(252), np.nan)
+            mdd = np.nanmin(filled / np.fmax.accumulate(filled, axis=0) - 1, axis=0) * 100
+
+        metrics = {"return": total, "volatility": vol, "drawdown": mdd, "sharpe": sharpe}
+        key = metrics[metric] if metric == "volatility" else -metrics[metric]
+        order = [j for j in np.argsort(key, kind='stable') if not np.isnan(key[j])][:top]
+        return [
+            {
+                "name": funds[keep[j]],
+                "return": float(total[j]),
+                "volatility": float(vol[j]),
+                "drawdown": float(mdd[j]),
+                "sharpe": float(sharpe[j]),
+                "coverage": float(coverage[keep[j]]),
+            }
+            for j in order
+        ]
+
+    def _load(self):
+        """ 延遲載入：清單讀 JSON，各塊以唯讀 memory-map 開啟後依日期組成一個矩陣 (後寫的塊覆蓋先寫的) """
+        if self._funds is not None:
+            return
+        self._funds, self._dates, self._chunks = [], [], []
+        self._navs = np.empty((0, 0), dtype=np.float32)
+        self._mtime = mtime(os.path.join(self.directory, 'chunks.json'))
+        try:
+            with open(os.path.join(self.directory, 'funds.json'), 'r', encoding='utf-8') as f:
+                funds = json.load(f)
+            with open(os.path.join(self.directory, 'chunks.json'), 'r', encoding='utf-8') as f:
+                chunks = json.load(f)
+            blocks = []
+            for chunk in chunks:
+                navs = np.load(os.path.join(self.directory, chunk["file"]), mmap_mode='r')
+                if navs.shape[0] != len(chunk["dates"]) or navs.shape[1] > len(funds):
+                    raise ValueError(f"{chunk['file']} 矩陣大小 {navs.shape} 與清單不符")
+                blocks.append((chunk["dates"], navs))
+        except FileNotFoundError:
+            return # 尚未建立存檔
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Universe Error: {e}")
+            return
+
+        row = {d: i for i, d in enumerate(sorted({d for dates, _ in blocks for d in dates}))}
+        matrix = np.full((len(row), len(funds)), np.nan, dtype=np.float32)
+        for dates, navs in blocks:
+            matrix[[row[d] for d in dates], :navs.shape[1]] = navs # 基金只會增加，後寫的塊欄數不少於先寫的
+        self._funds, self._dates, self._chunks, self._navs = funds, sorted(row), chunks, matrix
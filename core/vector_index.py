@@ -0,0 +1,73 @@
+import numpy as np
+
+def build_nav_matrix(nav_by_date, funds):
+    """
+    將 {日期: {基金: 淨值}} 轉成 (日期列表, 日期 × 基金 的 float 矩陣)，缺值為 NaN
+    """
+    dates = sorted(nav_by_date)
+    navs = np.full((len(dates), len(funds)), np.nan)
+    for i, d in enumerate(dates):
+        row = nav_by_date[d]
+        for j, name in enumerate(funds):
+            if name in row:
+                navs[i, j] = row[name]
+    return dates, navs
+
+def compute_index_series(dates, funds, navs, config):
+    """
+    一次算出整段指數 (NumPy 向量化)
+    dates: 已排序的日期字串列表；funds: 欄位對應的基金名稱；navs: 日期 × 基金矩陣
+    config: tsf_index_config.json 內容；rebalances 以除數 (divisor) 串接，確保再平衡前後點位連續
+
+    輸出: (指數值陣列 (缺值為 NaN), 解析後的再平衡設定列表)
+    """
+    dates = np.asarray(dates, dtype=str)
+    navs = np.asarray(navs, dtype=float)
+    col = {name: j for j, name in enumerate(funds)}
+    base_cap = float(config["base_market_cap"])
+
+    # 期初籃子：設定檔內的 units，除數即期初市值
+    periods = [(str(config["base_date"]), {n: c["units"] for n, c in config["constituents"].items()}, base_cap)]
+    resolved = []
+    for rb in sorted(config.get("rebalances", []), key=lambda r: str(r["date"])):
+        r_date = str(rb["date"])
+        row = int(np.searchsorted(dates, r_date))
+        if row >= len(dates) or dates[row] != r_date:
+            raise ValueError(f"再平衡日 {r_date} 缺少淨值資料")
+
+        # 1. 以舊籃子算出再平衡當日的指數點位
+        _, old_units, old_div = periods[-1]
+        level = _market_cap(navs[row:row + 1], col, old_units)[0] / old_div * 100
+        if np.isnan(level):
+            raise ValueError(f"再平衡日 {r_date} 舊成分股淨值不齊全")
+
+        # 2. 新籃子以期初資金依權重重新配置，再用除數接上原本點位
+        constituents = {}
+        for name, c in rb["constituents"].items():
+            nav = navs[row, col[name]] if name in col else np.nan
+            if np.isnan(nav):
+                raise ValueError(f"再平衡日 {r_date} 缺少 {name} 淨值")
+            constituents[name] = {"weight": c["weight"], "base_nav": float(nav), "units": c["weight"] * base_cap / nav}
+        new_units = {n: c["units"] for n, c in constituents.items()}
+        new_cap = sum(c["units"] * c["base_nav"] for c in constituents.values())
+        divisor = new_cap * 100 / level  # 使 新市值 / 除數 * 100 == 再平衡當日點位
+
+        periods.append((r_date, new_units, divisor))
+        resolved.append({"date": r_date, "divisor": divisor, "constituents": constituents})
+
+    # 3. 每一期各做一次矩陣乘法，整段歷史不需逐日迴圈
+    values = np.full(len(dates), np.nan)
+    for k, (start, units, divisor) in enumerate(periods):
+        lo = int(np.searchsorted(dates, start))
+        hi = int(np.searchsorted(dates, periods[k + 1][0])) if k + 1 < len(periods) else len(dates)
+        if lo < hi:
+            values[lo:hi] = _market_cap(navs[lo:hi], col, units) / divisor * 100
+    return values, resolved
+
+def _market_cap(nav_rows, col, units):
+    """ 市值 = 淨值 @ 單位數；任一成分股缺值則該日為 NaN """
+    missing = [n for n in units if n not in col]
+    if missing:
+        return np.full(len(nav_rows), np.nan)
+    cols = [col[n] for n in units]
+    return nav_rows[:, cols] @ np.array([units[n] for n in units])
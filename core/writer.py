@@ -0,0 +1,102 @@
+import functools
+import os
+import threading
+from contextlib import contextmanager
+from .config import WRITE_LOCK_FILE
+from .snapshot import write_snapshot
+
+try:
+    import fcntl # 跨行程檔案鎖 (Linux / macOS)；Windows 沒有時只做行程內互斥
+except ImportError:
+    fcntl = None
+
+_THREAD_LOCK = threading.Lock()
+
+@contextmanager
+def write_lock(path=WRITE_LOCK_FILE):
+    """ 所有寫入操作共用的互斥鎖：同一行程內用 threading.Lock，不同行程 (排程 / 網頁後台) 用檔案鎖 """
+    with _THREAD_LOCK:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _serialized(method):
+    """ 在寫入鎖內執行 (先重新讀取其他行程改過的檔案)，結束後重新發布快照 (讀者看到的永遠是完整的一版) """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with write_lock():
+            self.engines.refresh()
+            result = method(self, *args, **kwargs)
+            self.publish()
+        return result
+    return wrapper
+
+class IndexWriter:
+    """
+    唯一的寫入口：初始化、每日計算、批次補齊、重算、再平衡都經過這裡，依序執行、不會同時改同一個檔案
+    讀取端 (看板) 一律走 query.IndexQuery，只讀這裡發布的快照
+    """
+    def __init__(self, engines=None):
+        if engines is None:
+            from .multi_index import MultiIndexEngine
+            engines = MultiIndexEngine()
+        self.engines = engines
+
+    def __getitem__(self, index_id):
+        return self.engines[index_id]
+
+    def __iter__(self):
+        return iter(self.engines)
+
+    @_serialized
+    def calculate(self, target_date, navs=None):
+        """
+        每日計算所有指數 (回傳: {指數 id: (指數值, 明細)})
+        navs: 已確認齊全的當日淨值 (輪詢模式)，先寫入共用快取，計算時直接命中
+        """
+        if navs:
+            self.engines.nav_cache.put(target_date, navs)
+        results = self.engines.calculate_index(target_date)
+        # 輪詢時的抓取不經過計算 (快取命中)：公司對應與存檔要在這裡落地，下次排程才用得上
+        self.engines.scraper.flush()
+        return results
+
+    @_serialized
+    def initialize(self, index_id, base_date, funds=None, weights=None):
+        return self.engines[index_id].initialize_index(base_date, funds, weights)
+
+    @_serialized
+    def run_batch_update(self, end_date_str, progress_callback=None):
+        return self.engines.run_batch_update(end_date_str, progress_callback)
+
+    @_serialized
+    def recompute(self, index_id):
+        return self.engines[index_id].recompute_history()
+
+    @_serialized
+    def add_rebalance(self, index_id, rebalance_date, weights):
+        return self.engines[index_id].add_rebalance(rebalance_date, weights)
+
+    @_serialized
+    def reingest(self, navs_by_date):
+        """
+        【離線重建】以重新解析的淨值 {日期: {基金: 淨值}} 整天取代快取，再以向量化重算所有指數的歷史
+        回傳: {指數 id: (成功與否, 訊息)}
+        """
+        for date_str, navs in navs_by_date.items():
+            self.engines.nav_cache.put(date_str, navs, save=False, replace=True)
+        self.engines.nav_cache.save()
+        return {engine.index_id: engine.recompute_history() for engine in self.engines}
+
+    def publish(self):
+        """ 重建並原子替換每個指數的看板快照 (無論這次是否有新資料，確保與歷史檔一致) """
+        for engine in self.engines:
+            write_snapshot(engine.build_snapshot(), engine.snapshot_file)
+            engine.metrics.save()
@@ -1,28 +1,67 @@
 # run_daily_update.py
-import os
+import argparse
 from datetime import datetime
-from core.engine import IndexEngine
+from core.writer import IndexWriter
+from core.publication import PublicationLog, wait_for_publication, taipei_now, TAIPEI
+from core.config import POLL_UNTIL
+from core.tracing import tracer
+
+def poll(indices, date_str, until_str):
+    """ 輪詢模式：等到所有指數的成分股淨值都公布才往下算 (只讀不寫，回傳齊全的淨值交給寫入端) """
+    engines = [e for e in indices if date_str not in e.history]
+    names = []
+    for engine in engines:
+        try:
+            names += [n for n in engine._active_basket(engine._load_config(), date_str)[0] if n not in names]
+        except FileNotFoundError:
+            pass # 尚未初始化的指數
+    if not names:
+        print("✅ 今日已計算過或沒有需要計算的指數，不需輪詢")
+        return None
+    if not indices.calendar.is_trading_day(date_str):
+        print(f"💤 {date_str} 為休市日，不需輪詢")
+        return None
+
+    until = datetime.strptime(f"{date_str} {until_str}", "%Y%m%d %H:%M").replace(tzinfo=TAIPEI)
+    log = PublicationLog()
+    navs = wait_for_publication(indices.scraper, date_str, names, until, log)
+    summary = log.summary()
+    if summary:
+        print(f"🕕 近 {summary['days']} 個交易日公布時間：中位數 {summary['p50']}、p90 {summary['p90']}、最晚 {summary['latest']} (台灣時間)")
+    return navs
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--date', help='指定計算日期 (YYYYMMDD)，預設為今天 (台灣時間)')
+    ap.add_argument('--poll', action='store_true', help='輪詢直到公會公布所有成分股淨值')
+    ap.add_argument('--until', default=POLL_UNTIL, help='輪詢截止時間 (台灣時間 HH:MM)')
+    args = ap.parse_args()
     print("🤖 GitHub Action 機器人啟動...")
-    
-    # 初始化引擎
-    engine = IndexEngine()
-    
-    # 設定日期：抓取「今天」 (GitHub 主機通常是 UTC 時間，建議轉為台灣時間或直接抓當日)
-    # 這裡簡單抓取系統當下日期，稍後在 YAML 設定台灣時間下午執行即可
-    today_str = datetime.now().strftime("%Y%m%d")
-    
+
+    # 初始化寫入端 (registry 內所有指數共用一次抓取；所有寫檔都經過它並自動發布看板快照)
+    writer = IndexWriter()
+
+    # 設定日期：GitHub 主機是 UTC 時間，一律換算成台灣時間的「今天」
+    today_str = args.date or taipei_now().strftime("%Y%m%d")
+
     print(f"📅 正在計算日期: {today_str}")
-    
-    # 執行計算 (這會自動更新 tsf_history.csv)
+    navs = poll(writer.engines, today_str, args.until) if args.poll else None
+
+    # 執行計算 (這會自動更新各指數的歷史檔，並重建前端看板快照)
     # 若當天無資料 (假日)，engine 會回傳 None，不會寫入錯誤數據
-    idx_value, details = engine.calculate_index(today_str)
-    
-    if idx_value:
-        print(f"✅ 計算成功！今日指數: {idx_value:.2f}")
-    else:
-        print(f"⚠️ 今日無資料或計算失敗: {details}")
+    results = writer.calculate(today_str, navs)
+    for engine in writer:
+        idx_value, details = results[engine.index_id]
+        name = engine.index["name"]
+
+        if idx_value:
+            print(f"✅ [{name}] 計算成功！今日指數: {idx_value:.2f}")
+        else:
+            print(f"⚠️ [{name}] 今日無資料或計算失敗: {details}")
+    print("🖼️ 看板快照已更新")
+
+    # 效能摘要 (有設定 TSF_TRACE_FILE 才會輸出)
+    tracer.write_summary()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
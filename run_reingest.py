@@ -0,0 +1,50 @@
+# run_reingest.py
+# 成分股關鍵字 (TARGET_FUNDS / 各指數設定檔的 funds) 改了、或基金改名時：
+# 用 data/raw/ 的原始頁面存檔離線重新解析 (多行程並行)，重建淨值快取與所有指數歷史，不需重新爬取
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from core.raw_archive import RawArchive, reparse_day
+from core.registry import load_registry, fund_keywords
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--start', help='開始日期 (YYYYMMDD)，預設為存檔最早一天')
+    ap.add_argument('--end', help='結束日期 (YYYYMMDD)，預設為存檔最後一天')
+    ap.add_argument('--workers', type=int, default=os.cpu_count(), help='解析用的行程數')
+    ap.add_argument('--dry-run', action='store_true', help='只解析並列出結果，不寫入快取與歷史')
+    args = ap.parse_args()
+
+    archive = RawArchive()
+    pages = {}
+    for date_str, _, digest in archive.entries(args.start, args.end):
+        pages.setdefault(date_str, []).append(archive.path_for(digest))
+    if not pages:
+        print("⚠️ 原始頁面存檔是空的 (排程需設定 TSF_ARCHIVE_RAW=1 才會存檔)")
+        return
+
+    target_funds = fund_keywords(load_registry())
+    print(f"🗂️ 重新解析 {len(pages)} 天的存檔頁面 ({args.workers} 個行程，{len(target_funds)} 檔基金關鍵字)")
+    t0 = time.perf_counter()
+    jobs = [(d, paths, target_funds) for d, paths in sorted(pages.items())]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = dict(pool.map(reparse_day, jobs, chunksize=max(1, len(jobs) // (args.workers * 4))))
+    navs_by_date = {d: navs for d, navs in results.items() if navs}
+    print(f"⚡ 解析完成：{time.perf_counter() - t0:.2f} 秒，{len(navs_by_date)} 天有淨值、{len(results) - len(navs_by_date)} 天查無資料")
+
+    missing = {name: sum(name not in navs for navs in navs_by_date.values()) for name in target_funds}
+    for name, n in missing.items():
+        if n:
+            print(f"   {name}: {n} 天找不到 (關鍵字可能仍需調整)")
+    if args.dry_run:
+        return
+
+    from core.writer import IndexWriter # 重建走唯一的寫入端 (加鎖、完成後發布快照)
+    t0 = time.perf_counter()
+    for index_id, (success, msg) in IndexWriter().reingest(navs_by_date).items():
+        print(f"{'✅' if success else '❌'} [{index_id}] {msg}")
+    print(f"🧮 快取與歷史重建：{time.perf_counter() - t0:.2f} 秒")
+
+if __name__ == "__main__":
+    main()
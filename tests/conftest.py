@@ -0,0 +1,39 @@
+"""
+端到端回歸測試共用設定：仿真伺服器 + 每個測試各自的暫存資料夾 (完全離線，不碰 data/)
+"""
+import os
+import sys
+import tempfile
+
+# 必須在載入 core 之前設定：任何沒有明確傳入路徑的檔案 (公司對應、寫入鎖...) 都落在暫存目錄
+os.environ["TSF_DATA_DIR"] = tempfile.mkdtemp(prefix="tsf_test_")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from benchmarks.sitca_standin import start_standin
+from core.engine import IndexEngine
+from core.nav_cache import NavCache
+from core.scraper import SitcaScraper
+from core.trading_calendar import TradingCalendar
+
+@pytest.fixture(scope="session")
+def standin():
+    server = start_standin(n_funds=200)
+    yield server
+    server.shutdown()
+
+@pytest.fixture
+def engine(tmp_path, standin):
+    """ 指向仿真伺服器的全新指數 (設定檔、歷史、快取、日曆都在 tmp_path) """
+    index = {
+        "id": "test",
+        "name": "Test",
+        "config": str(tmp_path / "config.json"),
+        "history": str(tmp_path / "history.csv"),
+        "snapshot": str(tmp_path / "snapshot.json"),
+        "metrics": str(tmp_path / "metrics.json"),
+    }
+    scraper = SitcaScraper(rate_limit=0, url=standin.url, company_filter=False)
+    nav_cache = NavCache(str(tmp_path / "nav_cache.json"))
+    calendar = TradingCalendar(str(tmp_path / "holidays.txt"), str(tmp_path / "closed_days.json"))
+    return IndexEngine(index, scraper, nav_cache, calendar)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from core.analytics import TRADING_DAYS, rolling_contribution, rolling_drawdown, rolling_return, rolling_sharpe, rolling_volatility
+
+WINDOWS = [1, 2, 5, 20, 60, 299, 300, 400]
+
+@pytest.fixture(scope="module")
+def values():
+    """ 300 個交易日的隨機漫步指數 (從 10000 點起跳，放大累積和相減的誤差) """
+    rng = np.random.default_rng(7)
+    return 10000 * np.cumprod(1 + rng.normal(0.0004, 0.012, 300))
+
+def expected(values, window):
+    """ pandas 逐窗計算的對照組 """
+    s = pd.Series(values)
+    rets = s.pct_change()
+    mean, std = rets.rolling(window).mean(), rets.rolling(window).std()
+    return {
+        "return": s.pct_change(window) * 100,
+        "volatility": std * np.sqrt(TRADING_DAYS) * 100,
+        "sharpe": mean / std * np.sqrt(TRADING_DAYS),
+        "drawdown": (s / s.rolling(window).max() - 1) * 100,
+    }
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_rolling_metrics_match_pandas(values, window):
+    want = expected(values, window)
+    got = {
+        "return": rolling_return(values, window),
+        "volatility": rolling_volatility(values, window),
+        "sharpe": rolling_sharpe(values, window),
+        "drawdown": rolling_drawdown(values, window),
+    }
+    for metric, series in got.items():
+        assert series.shape == values.shape, metric
+        np.testing.assert_allclose(series, want[metric].to_numpy(), rtol=1e-9, atol=1e-9, err_msg=metric)
+
+def test_rolling_contribution_matches_pandas():
+    rng = np.random.default_rng(3)
+    points = rng.normal(0, 5, (3, 120))
+    points[0, 0] = np.nan # 基期沒有貢獻
+    points[1, 40] = np.nan # 缺一天淨值
+    for window in (1, 5, 20):
+        want = pd.DataFrame(points.T).rolling(window).sum().to_numpy().T.copy()
+        want[:, :window] = np.nan # 前 window 天沒有完整的區間變動
+        np.testing.assert_allclose(rolling_contribution(points, window), want, rtol=1e-9, atol=1e-9)
+
+@pytest.mark.parametrize("n", [0, 1, 2])
+def test_short_series_are_all_nan(n):
+    values = 100 + np.arange(n, dtype=float)
+    for fn in (rolling_return, rolling_volatility, rolling_sharpe):
+        out = fn(values, 5)
+        assert out.shape == (n,) and np.isnan(out).all(), fn.__name__
+    # 少於兩筆沒有日報酬：連 window=1 的波動、Sharpe 也算不出來
+    if n < 2:
+        assert np.isnan(rolling_volatility(values, 1)).all()
+        assert np.isnan(rolling_sharpe(values, 1)).all()
+    assert np.isnan(rolling_drawdown(values, n + 1)).all()
@@ -0,0 +1,208 @@
+import csv
+import threading
+from datetime import datetime, timedelta
+import pytest
+from benchmarks.sitca_standin import synthetic_navs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from core.history import HistoryStore
+from core.scraper import SitcaScraper
+from core.companies import CompanyMap
+from core.nav_cache import NavCache
+from core.parser import NavTableParser
+from core.ratelimit import TokenBucket
+from core.metrics import MetricsState
+from core.series import PERIODS, ohlc
+from core.snapshot import compute_kpis
+
+BASE = "20250102"
+END = "20250328"
+
+def open_days(server, start, end):
+    """ 仿真伺服器在 (start, end] 之間有開市的日期 """
+    days, dt = [], datetime.strptime(start, "%Y%m%d") + timedelta(days=1)
+    while dt <= datetime.strptime(end, "%Y%m%d"):
+        if not server.is_closed(dt.strftime("%Y%m%d")):
+            days.append(dt.strftime("%Y%m%d"))
+        dt += timedelta(days=1)
+    return days
+
+def test_backfill_matches_synthetic_navs(engine, standin):
+    assert engine.initialize_index(BASE)[0]
+    engine.run_batch_update(END)
+
+    config = engine._load_config()
+    expected = {BASE: 100.0}
+    for d in open_days(standin, BASE, END):
+        navs = synthetic_navs(d)
+        cap = sum(c["units"] * navs[name] for name, c in config["constituents"].items())
+        expected[d] = cap / config["base_market_cap"] * 100
+
+    rows = dict(engine.history.rows())
+    assert sorted(rows) == sorted(expected)
+    for d, value in expected.items():
+        assert rows[d] == pytest.approx(value, rel=1e-12)
+    # 查無資料的平日記入負向快取，週末不連線也不記
+    closed_weekdays = {d for d in set(open_days(standin, BASE, END)) ^ {
+        (datetime.strptime(BASE, "%Y%m%d") + timedelta(days=k)).strftime("%Y%m%d")
+        for k in range(1, (datetime.strptime(END, "%Y%m%d") - datetime.strptime(BASE, "%Y%m%d")).days + 1)
+    } if datetime.strptime(d, "%Y%m%d").weekday() < 5}
+    assert set(engine.calendar._load_closed()) == closed_weekdays
+
+def test_recompute_matches_daily_path_across_rebalance(engine, standin):
+    assert engine.initialize_index(BASE)[0]
+    engine.run_batch_update("20250228")
+    rebalance = open_days(standin, "20250228", END)[0]
+    assert engine.calculate_index(rebalance)[0] is not None
+    ok, msg = engine.add_rebalance(rebalance, {"統一奔騰": 0.4, "安聯台灣科技": 0.3, "野村鴻運": 0.3})
+    assert ok, msg
+
+    # 再平衡之後走每日路徑 (沿用寫回設定檔的 units / divisor)
+    for d in open_days(standin, rebalance, END):
+        assert engine.calculate_index(d)[0] is not None
+    daily = engine.history.rows()
+
+    ok, msg = engine.recompute_history()
+    assert ok, msg
+    recomputed = engine.history.rows()
+    assert [d for d, _ in recomputed] == [d for d, _ in daily]
+    for (d, a), (_, b) in zip(daily, recomputed):
+        assert a == pytest.approx(b, rel=1e-12), d
+
+    # 除數串接：再平衡日前後的指數不跳空 (新舊籃子在再平衡日等值)
+    config = engine._load_config()
+    old = engine._compute({**config, "rebalances": []}, synthetic_navs(rebalance), rebalance)[0]
+    assert dict(recomputed)[rebalance] == pytest.approx(old, rel=1e-12)
+
+    # 各檔貢獻加總等於每日指數變動 (含再平衡日)；基期前沒有快取的日子為 None
+    dates = [d for d, _ in recomputed]
+    points = engine.contribution_points(dates)["points"]
+    for t in range(1, len(dates)):
+        assert sum(p[t] for p in points) == pytest.approx(recomputed[t][1] - recomputed[t - 1][1], abs=1e-9), dates[t]
+    engine.nav_cache.as_dict().pop(dates[5])
+    points = engine.contribution_points(dates)["points"]
+    assert all(p[5] is None and p[6] is None and p[4] is not None for p in points)
+
+def test_metrics_sync_after_manual_edit(engine, tmp_path):
+    assert engine.initialize_index(BASE)[0]
+    engine.run_batch_update(END)
+    state = MetricsState(str(tmp_path / "metrics.json"))
+    state.sync(engine.history.rows())
+    state.save()
+
+    # 模擬在 GitHub 網頁上手動修改中間一列
+    path = engine.index["history"]
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    rows[len(rows) // 2][1] = repr(float(rows[len(rows) // 2][1]) * 0.9)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f, lineterminator='\n').writerows(rows)
+
+    history = HistoryStore(path).rows()
+    state = MetricsState(str(tmp_path / "metrics.json"))
+    kpis = state.sync(history)
+    assert 0 < state.recomputed < len(history)
+    expected = compute_kpis([v for _, v in history])
+    for key, value in expected.items():
+        assert kpis[key] == pytest.approx(value, rel=1e-9, abs=1e-12), key
+    for period in PERIODS:
+        assert state.bars[period] == ohlc(history, period)
+
+class _Unavailable(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(503)
+        self.end_headers()
+        self.wfile.write(b"<html><body>Service Unavailable</body></html>")
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+def test_http_errors_are_not_learned_as_closed_days(engine):
+    assert engine.initialize_index(BASE)[0]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Unavailable)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        engine.scraper.url = f"http://127.0.0.1:{server.server_address[1]}/"
+        assert engine.scraper.fetch_data("20250305") is None
+        assert engine.calculate_index("20250305") == (None, "No Data")
+        assert engine.calendar.is_trading_day("20250305")
+        assert engine.calendar._load_closed() == {}
+    finally:
+        server.shutdown()
+
+def test_unmatched_funds_are_not_learned_as_closed_days(engine, standin, tmp_path):
+    # 基金改名 (關鍵字對不到)：頁面有淨值表格，但一檔成分股都沒有
+    assert engine.initialize_index(BASE)[0]
+    day = open_days(standin, BASE, END)[0]
+    renamed = {name: [f"{keywords[0]}(已改名)"] for name, keywords in engine.scraper.parser.target_funds.items()}
+    engine.scraper.parser = NavTableParser(renamed)
+    assert engine.scraper.fetch_data(day) is None
+    assert engine.calculate_index(day)[0] is None
+    assert engine.calendar.is_trading_day(day)
+    assert engine.calendar._load_closed() == {}
+
+    # 公司篩選：公司頁有表格卻沒對到時改查全部確認，不記成休市、也不忘掉公司對應
+    scraper = SitcaScraper(rate_limit=0, url=standin.url)
+    scraper.companies = CompanyMap(str(tmp_path / "companies.json"))
+    scraper.fetch_data(BASE)
+    groups = scraper.companies.groups(scraper.parser.target_funds)
+    assert groups
+    scraper.parser = NavTableParser(renamed)
+    queried, fetch_page = [], scraper.fetch_page
+    scraper.fetch_page = lambda date_str, comid='': queried.append(comid) or fetch_page(date_str, comid)
+    assert scraper.fetch_data(day) is None
+    assert queried == [*groups, ""]
+    assert scraper.companies.groups(renamed) == groups
+
+def test_long_lived_writer_sees_other_processes_writes(tmp_path, standin):
+    from core.multi_index import MultiIndexEngine
+    from core.writer import IndexWriter
+
+    index = {"id": "test", "name": "Test", **{k: str(tmp_path / f"{k}.json") for k in ("config", "snapshot", "metrics")},
+             "history": str(tmp_path / "history.csv")}
+
+    def new_writer():
+        engines = MultiIndexEngine([index])
+        engines.scraper.url = standin.url
+        engines.scraper.bucket = TokenBucket(0)
+        engines.nav_cache.path = str(tmp_path / "nav_cache.json")
+        engines.calendar.closed_file = str(tmp_path / "closed_days.json")
+        return IndexWriter(engines)
+
+    days = open_days(standin, BASE, END)[:3]
+    app = new_writer() # 網頁後台長駐的寫入端
+    assert app.initialize("test", BASE)[0]
+    assert app.calculate(days[0])["test"][0] is not None
+    assert new_writer().calculate(days[1])["test"][0] is not None # 另一個行程 (每日排程)
+    assert app.calculate(days[2])["test"][0] is not None
+
+    assert NavCache(str(tmp_path / "nav_cache.json")).has(days[1], list(synthetic_navs(days[1])))
+    assert [d for d, _ in HistoryStore(index["history"]).rows()] == [BASE, *days]
+
+def test_history_rewrite_keeps_unchanged_lines(tmp_path):
+    # 既有檔案混用 CRLF / LF (在 Windows 建立、排程追加)：改寫時只有新增或改值的列會變
+    path = tmp_path / "history.csv"
+    original = b"date,index_value\r\n20260102,100.0\r\n20260105,101.50\n20260106,102.25\n"
+    path.write_bytes(original)
+    store = HistoryStore(str(path))
+    store.append("20260107", 103.0)
+    assert path.read_bytes() == original + b"20260107,103.0\n"
+    store.reset([*store.rows()[:-2], ("20260106", 99.0), ("20260107", 103.0)])
+    assert path.read_bytes() == original.replace(b"20260106,102.25", b"20260106,99.0") + b"20260107,103.0\n"
+
+def test_initialize_with_custom_weights(engine, standin):
+    weights = {"統一奔騰": 0.4, "安聯台灣科技": 0.3, "野村鴻運": 0.3}
+    assert not engine.initialize_index(BASE, weights={"統一奔騰": 0.5})[0]
+    assert engine.initialize_index(BASE, weights=weights)[0]
+    config = engine._load_config()
+    assert config["weights"] == weights
+    caps = {name: c["units"] * c["base_nav"] for name, c in config["constituents"].items()}
+    assert caps == pytest.approx({name: w * config["base_market_cap"] for name, w in weights.items()})
+
+    day = open_days(standin, BASE, END)[0]
+    value, details = engine.calculate_index(day)
+    navs = synthetic_navs(day)
+    assert value == pytest.approx(sum(c["units"] * navs[n] for n, c in config["constituents"].items()) / 1e4)
+    assert [d["權重"] for d in details] == ["40%", "30%", "30%"]
+    assert engine.initialize_index(BASE)[0] and engine._load_config()["weights"] == weights # 重新初始化沿用設定檔
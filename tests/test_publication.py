@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+import pytest
+from benchmarks.sitca_page import TARGET_ROWS, build_page
+from benchmarks.sitca_standin import synthetic_navs
+from core.publication import TAIPEI, PublicationLog, wait_for_publication
+from core.scraper import SitcaScraper
+
+DATE = "20250103"
+START = datetime(2025, 1, 3, 17, 0, 0, tzinfo=TAIPEI)
+FIRST = ["統一奔騰", "安聯台灣科技"] # 17:10 先公布
+REST = [n for n in TARGET_ROWS if n not in FIRST] # 17:20 公布其餘
+
+class Clock:
+    """ 假時鐘：sleep 只推進時間並記下等待秒數 """
+    def __init__(self):
+        self.t = START
+        self.waits = []
+
+    def now(self):
+        return self.t
+
+    def sleep(self, seconds):
+        self.waits.append(seconds)
+        self.t += timedelta(seconds=seconds)
+
+@pytest.fixture
+def staged(standin, monkeypatch):
+    """ 仿真伺服器依假時鐘分批公布：17:10 前查無資料、17:10 只有 FIRST、17:20 起只剩 REST (前一批的頁面消失，驗證累積) """
+    assert not standin.is_closed(DATE)
+    clock = Clock()
+    page_for = standin.page_for
+
+    def staged_page(date_str, comid=""):
+        if clock.t < START + timedelta(minutes=10):
+            return build_page(date_str, holiday=True)
+        hidden = REST if clock.t < START + timedelta(minutes=20) else FIRST
+        lines = page_for(date_str, comid).split("\n")
+        return "\n".join(l for l in lines if not any(TARGET_ROWS[n] in l for n in hidden))
+
+    monkeypatch.setattr(standin, "page_for", staged_page)
+    monkeypatch.setattr("core.publication.random.uniform", lambda a, b: 1.0) # 關掉抖動，等待秒數可預期
+    return clock
+
+def test_poller_resets_backoff_on_partial_publication(standin, staged, tmp_path):
+    log = PublicationLog(str(tmp_path / "publication_log.json"))
+    scraper = SitcaScraper(rate_limit=0, url=standin.url, company_filter=False)
+    navs = wait_for_publication(scraper, DATE, list(TARGET_ROWS), START + timedelta(hours=5), log, sleep=staged.sleep, now=staged.now)
+
+    assert navs == synthetic_navs(DATE)
+    # 17:00 / 17:05 查無資料，17:12:30 部分公布 (重設為 300 秒)，17:17:30 仍缺，17:25 齊全
+    assert staged.waits == [300, 450, 300, 450]
+    entry = PublicationLog(log.path).entry(DATE)
+    assert entry == {"first_probe": "17:00:00", "partial_at": "17:12:30", "published_at": "17:25:00", "probes": 5, "missing": []}
+
+def test_poller_gives_up_at_deadline(standin, staged, tmp_path):
+    log = PublicationLog(str(tmp_path / "publication_log.json"))
+    scraper = SitcaScraper(rate_limit=0, url=standin.url, company_filter=False)
+    until = START + timedelta(minutes=15)
+    assert wait_for_publication(scraper, DATE, list(TARGET_ROWS), until, log, sleep=staged.sleep, now=staged.now) is None
+
+    # 17:12:30 部分公布後下一次要等到 17:17:30，超過截止時間就不再睡
+    assert staged.waits == [300, 450]
+    entry = PublicationLog(log.path).entry(DATE)
+    assert entry["partial_at"] == "17:12:30" and entry["published_at"] is None
+    assert entry["probes"] == 3 and entry["missing"] == REST